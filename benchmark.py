@@ -0,0 +1,83 @@
+"""Startup benchmark: JSON files vs binary snapshot.
+
+Usage: python benchmark.py [student_count]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+
+import bot
+
+
+def generate_data(student_count, test_count=50):
+    """Fill the bot's in-memory storage with synthetic tests and students."""
+    now = datetime.now()
+    bot.tests = {}
+    records = {}
+    for i in range(1, test_count + 1):
+        test = bot.Test("abcdabcdabcdabcdabcd", bot.ADMIN_IDS[0], f"Test {i}")
+        test.date_created = now - timedelta(days=i)
+        bot.tests[f"{i:03d}"] = test
+    for user_id in range(1, student_count + 1):
+        student = bot.Student(user_id, f"Student{user_id} Familiya")
+        student.registration_date = now - timedelta(seconds=user_id)
+        for j in range(user_id % 3 + 1):
+            test_code = f"{(user_id + j) % test_count + 1:03d}"
+            student.test_results[test_code] = {"score": float(user_id % 101), "date": now}
+            bot.tests[test_code].attempts[user_id] = "abcdabcdabcdabcdabcd"
+        records[user_id] = student.to_dict()
+    bot.students.load(records)
+
+
+def time_load(use_snapshot, cold=True, repeat=3):
+    """Return the best wall-clock time of load_data() in seconds.
+
+    A cold start rebuilds the student cache database from the data files;
+    a warm start finds it already in sync and only loads tests.
+    """
+    bot.USE_SNAPSHOT = use_snapshot
+    best = float("inf")
+    for _ in range(repeat):
+        bot.tests = {}
+        if cold:
+            bot.students.load({})
+        start = time.perf_counter()
+        bot.load_data()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    student_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    bot.logger.disabled = True
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        bot.TESTS_FILE = os.path.join(data_dir, "tests.json")
+        bot.STUDENTS_FILE = os.path.join(data_dir, "students.json")
+        bot.OPEN_TESTS_FILE = os.path.join(data_dir, "open_tests.json")
+        bot.SNAPSHOT_FILE = os.path.join(data_dir, "snapshot.bin")
+        bot.students = bot.StudentCache(bot.STUDENT_CACHE_SIZE, os.path.join(data_dir, "students_cache.db"))
+
+        generate_data(student_count)
+        bot.USE_SNAPSHOT = True
+        bot.save_data()
+
+        json_size = os.path.getsize(bot.TESTS_FILE) + os.path.getsize(bot.STUDENTS_FILE)
+        snapshot_size = os.path.getsize(bot.SNAPSHOT_FILE)
+        json_time = time_load(use_snapshot=False)
+        snapshot_time = time_load(use_snapshot=True)
+        warm_time = time_load(use_snapshot=True, cold=False)
+
+    print(f"Students: {student_count}")
+    print(f"JSON:     {json_time:.3f}s  {json_size / 1e6:.1f} MB")
+    print(f"Snapshot: {snapshot_time:.3f}s  {snapshot_size / 1e6:.1f} MB")
+    print(f"Speedup:  {json_time / snapshot_time:.1f}x")
+    print(f"Warm:     {warm_time:.3f}s  (student cache database already in sync)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,29 @@
 import os
 import logging
-import json
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton, BotCommand, BotCommandScope
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
+from telegram.ext import (
+    Application, ApplicationHandlerStop, CommandHandler, MessageHandler, CallbackQueryHandler, TypeHandler,
+    ContextTypes, filters
+)
 from dotenv import load_dotenv
+import datafile
 import re
-from datetime import datetime
+import struct
+import sys
+import time
+import random
+import string
+import math
+import zlib
+import json
+import sqlite3
+import multiprocessing
+import signal
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import accumulate
+from datetime import datetime, timedelta
 import asyncio
 
 # Load environment variables
@@ -20,14 +38,49 @@ logger = logging.getLogger(__name__)
 # Data storage files
 TESTS_FILE = "data/tests.json"
 STUDENTS_FILE = "data/students.json"
+OPEN_TESTS_FILE = "data/open_tests.json"
+SNAPSHOT_FILE = "data/snapshot.bin"
+
+# Binary snapshot for fast cold start (JSON files stay the source of truth)
+USE_SNAPSHOT = os.getenv("USE_SNAPSHOT", "0") == "1"
+SNAPSHOT_MAGIC = b"TTBS"
+SNAPSHOT_VERSION = 2
 
 # Create data directory if it doesn't exist
 os.makedirs("data", exist_ok=True)
 
+# Process updates queued while the bot was down instead of dropping them
+CATCH_UP = os.getenv("CATCH_UP", "1") == "1"
+# Updates fetched, handled and saved per batch; Telegram returns at most 100 per request
+CATCH_UP_BATCH_SIZE = min(int(os.getenv("CATCH_UP_BATCH_SIZE", "100")), 100)
+
+# Multi-worker mode: several webhook replicas sharing one SQLite store
+WORKERS = int(os.getenv("WORKERS", "1"))
+STORE_FILE = "data/bot.db"
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Public URL of the load balancer in front of the workers
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))  # Worker i listens on WEBHOOK_PORT + i
+
+# Flood protection per user and kind of update: "burst/per_minute", e.g. RATE_LIMIT_ANSWER=3/6
+RATE_LIMIT_DEFAULTS = {
+    "command": "5/20",
+    "answer": "3/6",
+    "message": "5/20",
+    "callback": "10/60",
+}
+THROTTLE_REPLY = os.getenv("THROTTLE_REPLY", "1") == "1"  # Send a cooldown notice instead of dropping silently
+THROTTLE_REPLY_INTERVAL = 30  # Seconds between cooldown notices to the same user
+THROTTLED_USERS_WINDOW = 3600  # /flood counts users throttled within this many seconds
+RATE_LIMIT_PRUNE_INTERVAL = 60  # Seconds between sweeps of refilled buckets
+
+# Number of recently active students kept in memory; the rest live in STUDENT_CACHE_FILE
+STUDENT_CACHE_SIZE = int(os.getenv("STUDENT_CACHE_SIZE", "1000"))
+STUDENT_CACHE_FILE = "data/students_cache.db"
+
 # Store tests temporarily (in production, use a database)
 tests = {}
+open_tests = {}  # Open-answer tests, codes start with "O"
 user_names = {}
-students = {}  # Store student information
 ADMIN_IDS = [int(os.getenv("ADMIN_ID", "0"))]  # List of admin IDs
 
 # Verify token is loaded
@@ -35,6 +88,29 @@ token = os.getenv("TELEGRAM_BOT_TOKEN")
 if not token:
     raise ValueError("No token found in environment variables. Check your .env file.")
 
+EPOCH = datetime(1970, 1, 1)
+
+def _to_datetime(value):
+    """Decode a stored date: datetime, ISO string or epoch microseconds."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, int):
+        return EPOCH + timedelta(microseconds=value)
+    return datetime.fromisoformat(value)
+
+def _to_epoch(value):
+    """Encode a stored date as microseconds since the epoch."""
+    if isinstance(value, int):
+        return value
+    return (_to_datetime(value) - EPOCH) // timedelta(microseconds=1)
+
+def _to_text(value, fmt=None):
+    """Encode a stored date as text, reusing the original string if it was never decoded."""
+    if isinstance(value, str):
+        return value
+    value = _to_datetime(value)
+    return value.strftime(fmt) if fmt else value.isoformat()
+
 class Student:
     def __init__(self, user_id, full_name):
         self.user_id = user_id
@@ -42,6 +118,30 @@ class Student:
         self.test_results = {}  # {test_code: {score: float, date: datetime}}
         self.registration_date = datetime.now()
 
+    # Dates are kept in their stored form and decoded on first access
+    @property
+    def registration_date(self):
+        if not isinstance(self._registration_date, datetime):
+            self._registration_date = _to_datetime(self._registration_date)
+        return self._registration_date
+
+    @registration_date.setter
+    def registration_date(self, value):
+        self._registration_date = value
+
+    @property
+    def test_results(self):
+        if not self._results_decoded:
+            for result in self._test_results.values():
+                result["date"] = _to_datetime(result["date"])
+            self._results_decoded = True
+        return self._test_results
+
+    @test_results.setter
+    def test_results(self, value):
+        self._test_results = value
+        self._results_decoded = False
+
     def to_dict(self):
         return {
             "user_id": self.user_id,
@@ -49,27 +149,38 @@ class Student:
             "test_results": {
                 code: {
                     "score": result["score"],
-                    "date": result["date"].isoformat()
+                    "date": _to_text(result["date"])
                 }
-                for code, result in self.test_results.items()
+                for code, result in self._test_results.items()
             },
-            "registration_date": self.registration_date.isoformat()
+            "registration_date": _to_text(self._registration_date)
         }
 
     @classmethod
     def from_dict(cls, data):
-        student = cls(data["user_id"], data["full_name"])
-        student.test_results = {
+        test_results = {
             code: {
                 "score": result["score"],
-                "date": datetime.fromisoformat(result["date"])
+                "date": result["date"]
             }
             for code, result in data["test_results"].items()
         }
-        student.registration_date = datetime.fromisoformat(data["registration_date"])
+        return cls._restore(data["user_id"], data["full_name"], test_results, data["registration_date"])
+
+    @classmethod
+    def _restore(cls, user_id, full_name, test_results, registration_date):
+        """Rebuild a stored student without going through __init__."""
+        student = cls.__new__(cls)
+        student.user_id = user_id
+        student.full_name = full_name
+        student._test_results = test_results
+        student._results_decoded = False
+        student._registration_date = registration_date
         return student
 
 class Test:
+    DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
     def __init__(self, code, creator_id, name="Test"):
         self.code = code
         self.creator_id = creator_id
@@ -79,13 +190,23 @@ class Test:
         self.is_scored = False
         self.max_score = 0
 
+    @property
+    def date_created(self):
+        if not isinstance(self._date_created, datetime):
+            self._date_created = _to_datetime(self._date_created)
+        return self._date_created
+
+    @date_created.setter
+    def date_created(self, value):
+        self._date_created = value
+
     def to_dict(self):
         return {
             "code": self.code,
             "creator_id": self.creator_id,
             "name": self.name,
             "attempts": self.attempts,
-            "date_created": self.date_created.strftime("%Y-%m-%d %H:%M:%S"),
+            "date_created": _to_text(self._date_created, self.DATE_FORMAT),
             "is_scored": self.is_scored,
             "max_score": self.max_score
         }
@@ -93,14 +214,757 @@ class Test:
     @classmethod
     def from_dict(cls, data):
         test = cls(data["code"], data["creator_id"], data.get("name", "Test"))
-        test.attempts = data["attempts"]
-        test.date_created = datetime.strptime(data["date_created"], "%Y-%m-%d %H:%M:%S")
+        test.attempts = {int(user_id): answer for user_id, answer in data["attempts"].items()}
+        test.date_created = data["date_created"]
         test.is_scored = data.get("is_scored", False)
         test.max_score = data.get("max_score", 0)
         return test
 
+APOSTROPHES = str.maketrans({char: "'" for char in "‘’`ʻʼ"})
+
+def normalize_answer(text):
+    """Normalize a free-form answer: case, apostrophes, spaces and surrounding punctuation."""
+    text = " ".join(text.translate(APOSTROPHES).casefold().split())
+    return text.strip(string.punctuation.replace("'", "") + " ")
+
+def typo_tolerance(answer):
+    """Number of typos (edit distance) accepted for a normalized answer."""
+    if answer.replace(" ", "").isdigit() or len(answer) <= 3:
+        return 0
+    return 1 if len(answer) <= 7 else 2
+
+def within_edit_distance(a, b, limit):
+    """Check if the Levenshtein distance between a and b is at most limit."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+class OpenTest:
+    """Test where each question accepts a set of free-form answers."""
+
+    def __init__(self, code, creator_id, name, answers):
+        self.code = code
+        self.creator_id = creator_id
+        self.name = name
+        self.answers = answers  # [[accepted answer, ...] for each question]
+        self.attempts = {}  # user_id: [answer for each question]
+        self.date_created = datetime.now()
+        self.prepare()
+
+    def prepare(self):
+        """Precompute normalized accepted answers; call after changing self.answers."""
+        self.accepted = [
+            {normalize_answer(answer) for answer in alternatives} - {""}
+            for alternatives in self.answers
+        ]
+        self.checked = {}  # (question, normalized answer): is correct
+
+    def is_correct(self, question, answer):
+        answer = normalize_answer(answer)
+        key = (question, answer)
+        if key not in self.checked:
+            accepted = self.accepted[question]
+            numbers = re.findall(r"\d+", answer)
+            self.checked[key] = answer in accepted or any(
+                re.findall(r"\d+", correct) == numbers  # Typos are only forgiven in words
+                and within_edit_distance(answer, correct, typo_tolerance(correct))
+                for correct in accepted
+            )
+        return self.checked[key]
+
+    def count_correct(self, answers):
+        return sum(1 for question, answer in enumerate(answers) if self.is_correct(question, answer))
+
+    def to_dict(self):
+        return {
+            "code": self.code,
+            "creator_id": self.creator_id,
+            "name": self.name,
+            "answers": self.answers,
+            "attempts": self.attempts,
+            "date_created": self.date_created.strftime(Test.DATE_FORMAT)
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        test = cls(data["code"], data["creator_id"], data.get("name", "Test"), data["answers"])
+        test.attempts = {int(user_id): answers for user_id, answers in data["attempts"].items()}
+        test.date_created = _to_datetime(data["date_created"])
+        return test
+
+def _latest_mtime(paths):
+    return max((os.stat(path).st_mtime_ns for path in paths), default=0)
+
+class StudentCache:
+    """LRU cache of recently active students in front of an on-disk store.
+
+    Only the most recently used students are kept in memory as Student
+    objects. Every student also has a record in the store's students table
+    (data/students_cache.db in single-process mode, the shared database in
+    worker mode). Evicted students are written back there and faulted back
+    in on the next lookup, so memory use is bounded by `capacity`.
+
+    In single-process mode the database is kept across restarts and only
+    rebuilt when the data files changed since it was last synced with them.
+    """
+
+    def __init__(self, capacity, path=None):
+        self.capacity = max(1, capacity)
+        self.path = path
+        self._store = None  # Opened on first use
+        self.active = OrderedDict()  # user_id: Student, least recently used first
+        self.stored = {}  # user_id: dict as last read from or written to the store, for active students
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = SharedStore(self.path)
+        return self._store
+
+    def __contains__(self, user_id):
+        return user_id in self.active or self.store.has_student(user_id)
+
+    def __len__(self):
+        return self.store.count_students()
+
+    def __getitem__(self, user_id):
+        student = self.active.get(user_id)
+        if student is not None:
+            self.hits += 1
+            self.active.move_to_end(user_id)
+            return student
+
+        record = self.store.get_student(user_id)
+        if record is None:
+            raise KeyError(user_id)
+        self.misses += 1
+        student = Student.from_dict(record)
+        self._activate(user_id, student, student.to_dict())  # Dates as text, like to_dict() later
+        return student
+
+    def __setitem__(self, user_id, student):
+        record = student.to_dict()
+        self.store.put_students([record])  # Keeps len() and `in` exact
+        self._activate(user_id, student, record)
+
+    def _activate(self, user_id, student, record):
+        self.active[user_id] = student
+        self.active.move_to_end(user_id)
+        self.stored[user_id] = record
+        while len(self.active) > self.capacity:
+            evicted_id, evicted = self.active.popitem(last=False)
+            record = evicted.to_dict()
+            if record != self.stored.pop(evicted_id):
+                self.store.put_students([record])  # Write back
+            self.evictions += 1
+
+    def mark_stored(self, user_id):
+        """Note that the store already holds the current state of an active student."""
+        self.stored[user_id] = self.active[user_id].to_dict()
+
+    def values(self):
+        """Iterate over all students without changing the LRU order."""
+        yield from self.active.values()
+        for user_id, record in self.store.iter_students():
+            if user_id not in self.active:
+                yield Student.from_dict(record)
+
+    def load(self, records):
+        """Replace the contents with stored records ({user_id: dict} or (user_id, dict) pairs)."""
+        self.active.clear()
+        self.stored.clear()
+        self.store.replace_students(records.items() if hasattr(records, "items") else records)
+        self.mark_synced([])
+
+    def is_synced(self, paths):
+        """Check if the store holds what was last loaded from or saved to `paths`, as they are now."""
+        return self.store._get_meta("synced_mtime") == _latest_mtime(paths)
+
+    def mark_synced(self, paths):
+        with self.store.transaction():
+            self.store._set_meta("synced_mtime", _latest_mtime(paths))
+
+    def set_scores(self, test_code, scores):
+        """Set the score of `test_code` for many students ({user_id: score}) without caching them.
+
+        Active students are updated in place and saved with them; the rest
+        are updated in the store in one transaction. Students that are not
+        registered are skipped. Returns the number of results that changed.
+        """
+        changed = 0
+        rest = []
+        current = self.store.get_scores(test_code)
+        for user_id, score in scores.items():
+            student = self.active.get(user_id)
+            if student is None:
+                if current.get(user_id) != score:
+                    rest.append((user_id, score))
+                continue
+            result = student.test_results.get(test_code)
+            if result is None:
+                student.test_results[test_code] = {"score": score, "date": datetime.now()}
+                changed += 1
+            elif result["score"] != score:
+                result["score"] = score
+                changed += 1
+        return changed + self.store.set_scores(test_code, rest, datetime.now())
+
+    def peek(self, user_id):
+        """Return a student without caching it or counting a lookup, or None."""
+        if user_id in self.active:
+            return self.active[user_id]
+        record = self.store.get_student(user_id)
+        return Student.from_dict(record) if record is not None else None
+
+    def iter_dicts(self):
+        """Yield (user_id, stored dict) for every student, with dates as text."""
+        for user_id, student in self.active.items():
+            yield user_id, student.to_dict()
+        for user_id, record in self.store.iter_students():
+            if user_id in self.active:
+                continue
+            if not isinstance(record["registration_date"], str) or any(
+                not isinstance(result["date"], str) for result in record["test_results"].values()
+            ):
+                # Loaded from the snapshot; dates are still epoch numbers
+                record = Student.from_dict(record).to_dict()
+            yield user_id, record
+
+    def flush(self):
+        """Write active students that changed since they were read to the store."""
+        changed = []
+        for user_id, student in self.active.items():
+            record = student.to_dict()
+            if record != self.stored[user_id]:
+                changed.append(record)
+                self.stored[user_id] = record
+        self.store.put_students(changed)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "active": len(self.active),
+            "stored": len(self),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups * 100 if lookups else 0.0,
+        }
+
+students = StudentCache(STUDENT_CACHE_SIZE, STUDENT_CACHE_FILE)  # Store student information
+
+def _attempt_text(answer):
+    """Answers to open tests are lists, stored as JSON in the attempts table."""
+    return answer if isinstance(answer, str) else json.dumps(answer, ensure_ascii=False)
+
+class SharedStore:
+    """SQLite database shared by all worker processes (WORKERS > 1).
+
+    Attempts have their own table keyed by (test_code, user_id), so an
+    answer is recorded at most once whichever worker receives it. Test
+    results live in the results table rather than inside the student
+    record, so recording an answer is two small inserts. Tests and
+    open tests share the tests table and are stored without their attempts
+    (open test answers are JSON lists in the attempts table); workers pick up new attempts
+    incrementally by rowid and reload tests only when `tests_version` changes.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tests (code TEXT PRIMARY KEY, record TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS attempts (
+                test_code TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                answer TEXT NOT NULL,
+                PRIMARY KEY (test_code, user_id)
+            );
+            CREATE TABLE IF NOT EXISTS students (user_id INTEGER PRIMARY KEY, record TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS results (
+                test_code TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                score REAL NOT NULL,
+                date NOT NULL,  -- ISO text, or epoch microseconds from the snapshot
+                PRIMARY KEY (user_id, test_code)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        self.tests_version = None
+        self.attempts_rowid = 0
+        self.synced_tests = {}  # code: test record as last read or written
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Run a block as one write transaction, holding the database write lock."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def _get_meta(self, key, default=0):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    def import_data(self, tests, open_tests, student_records):
+        """Replace the store contents with the given tests and (user_id, record) pairs."""
+        self.replace_students(student_records)
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM tests")
+            conn.execute("DELETE FROM attempts")
+            for code, test in list(tests.items()) + list(open_tests.items()):
+                record = test.to_dict()
+                del record["attempts"]
+                conn.execute("INSERT INTO tests VALUES (?, ?)", (code, json.dumps(record, ensure_ascii=False)))
+                conn.executemany(
+                    "INSERT INTO attempts VALUES (?, ?, ?)",
+                    ((code, user_id, _attempt_text(answer)) for user_id, answer in test.attempts.items())
+                )
+            self._set_meta("tests_version", self._get_meta("tests_version") + 1)
+            self._set_meta("clean_shutdown", 0)
+        self.tests_version = None
+        logger.info(
+            f"Imported {len(tests)} tests, {len(open_tests)} open tests and "
+            f"{self.count_students()} students into {STORE_FILE}"
+        )
+
+    def export_data(self):
+        """Return (tests, open_tests, student_records) with everything in the store."""
+        tests, open_tests = {}, {}
+        self.tests_version = None
+        self.sync_tests(tests, open_tests)
+        student_records = {user_id: record for user_id, record in self.iter_students()}
+        return tests, open_tests, student_records
+
+    def had_clean_shutdown(self):
+        return self._get_meta("clean_shutdown", 1) == 1
+
+    def mark_clean_shutdown(self):
+        with self.transaction():
+            self._set_meta("clean_shutdown", 1)
+
+    def sync_tests(self, tests, open_tests):
+        """Bring the tests and open_tests dicts up to date with the store, in place."""
+        version = self._get_meta("tests_version")
+        if version != self.tests_version:
+            tests.clear()
+            open_tests.clear()
+            self.synced_tests = {}
+            for code, record in self.conn.execute("SELECT code, record FROM tests"):
+                data = json.loads(record)
+                data["attempts"] = {}
+                if "answers" in data:
+                    open_tests[code] = OpenTest.from_dict(data)
+                else:
+                    tests[code] = Test.from_dict(data)
+                self.synced_tests[code] = record
+            self.tests_version = version
+            self.attempts_rowid = 0
+
+        rows = self.conn.execute(
+            "SELECT rowid, test_code, user_id, answer FROM attempts WHERE rowid > ? ORDER BY rowid",
+            (self.attempts_rowid,)
+        ).fetchall()
+        for rowid, test_code, user_id, answer in rows:
+            if test_code in tests:
+                tests[test_code].attempts[user_id] = answer
+            elif test_code in open_tests:
+                open_tests[test_code].attempts[user_id] = json.loads(answer)
+            self.attempts_rowid = rowid
+
+    def save_tests(self, tests, open_tests):
+        """Write tests and open tests whose details changed since the last sync."""
+        changed = []
+        for code, test in list(tests.items()) + list(open_tests.items()):
+            data = test.to_dict()
+            del data["attempts"]
+            record = json.dumps(data, ensure_ascii=False)
+            if self.synced_tests.get(code) != record:
+                changed.append((code, record))
+        if not changed:
+            return
+
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO tests VALUES (?, ?) ON CONFLICT(code) DO UPDATE SET record = excluded.record",
+                changed
+            )
+            version = self._get_meta("tests_version") + 1
+            self._set_meta("tests_version", version)
+        # Our own write does not require a reload as long as we were up to date
+        if self.tests_version == version - 1:
+            self.tests_version = version
+        self.synced_tests.update(changed)
+
+    def create_test(self, prefix, build):
+        """Insert build(code) under the next free code starting with prefix.
+
+        The code is chosen inside the write transaction, so two workers
+        creating a test at the same time never get the same code.
+        Returns (code, test).
+        """
+        with self.transaction() as conn:
+            taken = {code for (code,) in conn.execute("SELECT code FROM tests")}
+            number = 1
+            while f"{prefix}{number:03d}" in taken:
+                number += 1
+            code = f"{prefix}{number:03d}"
+            test = build(code)
+            data = test.to_dict()
+            del data["attempts"]
+            record = json.dumps(data, ensure_ascii=False)
+            conn.execute("INSERT INTO tests VALUES (?, ?)", (code, record))
+            version = self._get_meta("tests_version") + 1
+            self._set_meta("tests_version", version)
+        if self.tests_version == version - 1:
+            self.tests_version = version
+        self.synced_tests[code] = record
+        return code, test
+
+    def record_attempt(self, test_code, user_id, answer, result):
+        """Atomically record an attempt and the student's result.
+
+        Returns False if the student already answered this test.
+        """
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO attempts VALUES (?, ?, ?)", (test_code, user_id, _attempt_text(answer))
+            )
+            if cursor.rowcount == 0:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (test_code, user_id, result["score"], _to_text(result["date"]))
+            )
+        return True
+
+    def get_scores(self, test_code):
+        return dict(self.conn.execute("SELECT user_id, score FROM results WHERE test_code = ?", (test_code,)))
+
+    def set_scores(self, test_code, scores, date):
+        """Add or update results of registered students from (user_id, score) pairs.
+
+        Existing results keep their date. Returns the number of rows written.
+        """
+        if not scores:
+            return 0
+        with self.transaction() as conn:
+            cursor = conn.executemany(
+                "INSERT INTO results SELECT ?, user_id, ?, ? FROM students WHERE user_id = ? "
+                "ON CONFLICT(user_id, test_code) DO UPDATE SET score = excluded.score",
+                ((test_code, score, _to_text(date), user_id) for user_id, score in scores)
+            )
+            return cursor.rowcount
+
+    def get_student(self, user_id):
+        row = self.conn.execute("SELECT record FROM students WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        test_results = record.setdefault("test_results", {})
+        for test_code, score, date in self.conn.execute(
+            "SELECT test_code, score, date FROM results WHERE user_id = ?", (user_id,)
+        ):
+            test_results[test_code] = {"score": score, "date": date}
+        return record
+
+    def has_student(self, user_id):
+        return self.conn.execute("SELECT 1 FROM students WHERE user_id = ?", (user_id,)).fetchone() is not None
+
+    def count_students(self):
+        return self.conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+
+    def iter_students(self):
+        # Both tables are read in user_id order and merged
+        results = self.conn.execute("SELECT user_id, test_code, score, date FROM results ORDER BY user_id")
+        result = next(results, None)
+        for user_id, record in self.conn.execute("SELECT user_id, record FROM students ORDER BY user_id"):
+            record = json.loads(record)
+            test_results = record.setdefault("test_results", {})
+            while result is not None and result[0] <= user_id:
+                if result[0] == user_id:
+                    test_results[result[1]] = {"score": result[2], "date": result[3]}
+                result = next(results, None)
+            yield user_id, record
+
+    @staticmethod
+    def _split_student(record, result_rows):
+        """Return the students row for a record and append its results rows."""
+        data = dict(record)
+        user_id = data["user_id"]
+        for test_code, result in data.pop("test_results").items():
+            date = result["date"]
+            if isinstance(date, datetime):
+                date = _to_text(date)  # Text and snapshot epoch values are kept as they are
+            result_rows.append((test_code, user_id, result["score"], date))
+        return user_id, json.dumps(data, ensure_ascii=False)
+
+    def replace_students(self, records):
+        """Replace all students with the given (user_id, record) pairs."""
+        result_rows = []
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM students")
+            conn.execute("DELETE FROM results")
+            conn.executemany(
+                "INSERT INTO students VALUES (?, ?)",
+                (self._split_student(record, result_rows) for _, record in records)
+            )
+            conn.executemany("INSERT INTO results VALUES (?, ?, ?, ?)", result_rows)
+
+    def put_students(self, records):
+        """Write student records. Results are only added or updated, never removed,
+        so results other workers recorded meanwhile are kept."""
+        if not records:
+            return
+        result_rows = []
+        student_rows = [self._split_student(record, result_rows) for record in records]
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO students VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET record = excluded.record",
+                student_rows
+            )
+            conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", result_rows)
+
+class SharedStudentCache(StudentCache):
+    """Student cache backed by the database shared by all workers.
+
+    Any worker may change any student, so the active set only lives for
+    the duration of one update (see refresh_from_store()).
+    """
+
+    def __init__(self, capacity, store):
+        super().__init__(capacity)
+        self._store = store
+
+    def reset(self):
+        self.active.clear()
+        self.stored.clear()
+
+store = None  # SharedStore in worker processes
+
+def refresh_from_store():
+    """Pick up changes other workers made to the shared store."""
+    store.sync_tests(tests, open_tests)
+    students.reset()
+
+def _pack_array(buf, typecode, values):
+    data = array(typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    buf += struct.pack("<I", len(data) * data.itemsize)
+    buf += data.tobytes()
+
+def _unpack_array(view, offset, typecode):
+    (size,) = struct.unpack_from("<I", view, offset)
+    offset += 4
+    if offset + size > len(view):
+        raise ValueError("Corrupt snapshot: column extends past the end of the file")
+    data = array(typecode)
+    data.frombytes(view[offset:offset + size])
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data, offset + size
+
+def _pack_strings(buf, values):
+    values = [str(value) for value in values]
+    _pack_array(buf, "I", [len(value) for value in values])
+    data = "".join(values).encode("utf-8")
+    buf += struct.pack("<I", len(data))
+    buf += data
+
+def _unpack_strings(view, offset):
+    lengths, offset = _unpack_array(view, offset, "I")
+    (size,) = struct.unpack_from("<I", view, offset)
+    offset += 4
+    if offset + size > len(view):
+        raise ValueError("Corrupt snapshot: column extends past the end of the file")
+    text = str(view[offset:offset + size], "utf-8")
+    ends = list(accumulate(lengths))
+    if (ends[-1] if ends else 0) != len(text):
+        raise ValueError("Corrupt snapshot: string lengths do not match the text")
+    return [text[end - length:end] for length, end in zip(lengths, ends)], offset + size
+
+def save_snapshot(student_data):
+    """Save all data to the binary snapshot file.
+
+    Layout: magic, u16 version, u32 test count, u32 student count, then one
+    column per field. Numeric columns are little endian arrays, string
+    columns are an array of lengths followed by the UTF-8 text. Dates are
+    stored as microseconds since the epoch.
+    """
+    buf = bytearray(struct.pack("<4sHII", SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(tests), len(students)))
+
+    test_list = list(tests.values())
+    _pack_strings(buf, tests.keys())
+    _pack_strings(buf, [test.code for test in test_list])
+    _pack_array(buf, "q", [test.creator_id for test in test_list])
+    _pack_strings(buf, [test.name for test in test_list])
+    _pack_array(buf, "q", [_to_epoch(test._date_created) for test in test_list])
+    _pack_array(buf, "b", [test.is_scored for test in test_list])
+    _pack_array(buf, "d", [test.max_score for test in test_list])
+    _pack_array(buf, "I", [len(test.attempts) for test in test_list])
+    _pack_array(buf, "q", [user_id for test in test_list for user_id in test.attempts])
+    _pack_strings(buf, [answer for test in test_list for answer in test.attempts.values()])
+
+    student_list = list(student_data.values())
+    results = [(code, result) for student in student_list for code, result in student["test_results"].items()]
+    _pack_array(buf, "q", [student["user_id"] for student in student_list])
+    _pack_strings(buf, [student["full_name"] for student in student_list])
+    _pack_array(buf, "q", [_to_epoch(student["registration_date"]) for student in student_list])
+    _pack_array(buf, "I", [len(student["test_results"]) for student in student_list])
+    _pack_strings(buf, [code for code, _ in results])
+    _pack_array(buf, "d", [result["score"] for _, result in results])
+    _pack_array(buf, "q", [_to_epoch(result["date"]) for _, result in results])
+
+    tmp_file = SNAPSHOT_FILE + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(buf)
+    os.replace(tmp_file, SNAPSHOT_FILE)
+    logger.info(f"Saved snapshot of {len(tests)} tests and {len(students)} students to {SNAPSHOT_FILE}")
+
+def student_sources():
+    """Data files the student cache database is loaded from."""
+    return [path for path in (STUDENTS_FILE, SNAPSHOT_FILE) if os.path.exists(path)]
+
+def snapshot_is_fresh():
+    """Check that the snapshot exists and is not older than the JSON files."""
+    if not os.path.exists(SNAPSHOT_FILE):
+        return False
+    snapshot_mtime = os.path.getmtime(SNAPSHOT_FILE)
+    return all(
+        not os.path.exists(path) or os.path.getmtime(path) <= snapshot_mtime
+        for path in (TESTS_FILE, STUDENTS_FILE)
+    )
+
+def load_snapshot(load_students=True):
+    """Load all data from the binary snapshot file.
+
+    With load_students=False only tests are loaded and the student columns
+    are not decoded. Raises ValueError if the file has an unknown header or
+    is truncated.
+    """
+    global tests
+
+    with open(SNAPSHOT_FILE, 'rb') as f:
+        view = memoryview(f.read())
+
+    try:
+        magic, version, test_count, student_count = struct.unpack_from("<4sHII", view, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot header {magic!r} v{version}")
+        offset = struct.calcsize("<4sHII")
+
+        test_codes, offset = _unpack_strings(view, offset)
+        keys, offset = _unpack_strings(view, offset)
+        creator_ids, offset = _unpack_array(view, offset, "q")
+        names, offset = _unpack_strings(view, offset)
+        dates, offset = _unpack_array(view, offset, "q")
+        is_scored, offset = _unpack_array(view, offset, "b")
+        max_scores, offset = _unpack_array(view, offset, "d")
+        attempt_counts, offset = _unpack_array(view, offset, "I")
+        attempt_users, offset = _unpack_array(view, offset, "q")
+        attempt_answers, offset = _unpack_strings(view, offset)
+
+        if load_students:
+            user_ids, offset = _unpack_array(view, offset, "q")
+            full_names, offset = _unpack_strings(view, offset)
+            registration_dates, offset = _unpack_array(view, offset, "q")
+            result_counts, offset = _unpack_array(view, offset, "I")
+            result_codes, offset = _unpack_strings(view, offset)
+            scores, offset = _unpack_array(view, offset, "d")
+            result_dates, offset = _unpack_array(view, offset, "q")
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Corrupt snapshot: {e}") from e
+
+    # Every column must match the counts it is indexed by
+    test_columns = (test_codes, keys, creator_ids, names, dates, is_scored, max_scores, attempt_counts)
+    columns_match = (
+        all(len(column) == test_count for column in test_columns)
+        and len(attempt_users) == len(attempt_answers) == sum(attempt_counts)
+    )
+    if load_students:
+        student_columns = (user_ids, full_names, registration_dates, result_counts)
+        columns_match = (
+            columns_match
+            and all(len(column) == student_count for column in student_columns)
+            and len(result_codes) == len(scores) == len(result_dates) == sum(result_counts)
+            and offset == len(view)
+        )
+    if not columns_match:
+        raise ValueError("Corrupt snapshot: column lengths do not match header")
+
+    loaded_tests = {}
+    start = 0
+    for i, code in enumerate(test_codes):
+        end = start + attempt_counts[i]
+        test = Test(keys[i], creator_ids[i], names[i])
+        test.attempts = dict(zip(attempt_users[start:end], attempt_answers[start:end]))
+        test.date_created = dates[i]
+        test.is_scored = bool(is_scored[i])
+        test.max_score = int(max_scores[i]) if max_scores[i].is_integer() else max_scores[i]
+        loaded_tests[code] = test
+        start = end
+    tests = loaded_tests
+
+    if not load_students:
+        logger.info(f"Loaded {len(tests)} tests from {SNAPSHOT_FILE}")
+        return
+
+    def student_records():
+        start = 0
+        for user_id, full_name, registration_date, count in zip(user_ids, full_names, registration_dates, result_counts):
+            end = start + count
+            test_results = {
+                result_codes[i]: {"score": scores[i], "date": result_dates[i]}
+                for i in range(start, end)
+            }
+            yield user_id, {
+                "user_id": user_id,
+                "full_name": full_name,
+                "test_results": test_results,
+                "registration_date": registration_date
+            }
+            start = end
+
+    students.load(student_records())
+    logger.info(f"Loaded {len(tests)} tests and {len(students)} students from {SNAPSHOT_FILE}")
+
 def save_data():
-    """Save all data to JSON files."""
+    """Save all data to JSON files (see datafile.py), or to the shared store in worker processes."""
+    if store is not None:
+        store.save_tests(tests, open_tests)
+        students.flush()
+        return
+
     try:
         # Create data directory if it doesn't exist
         if not os.path.exists('data'):
@@ -108,16 +972,27 @@ def save_data():
             logger.info("Created data directory")
 
         # Save tests
-        with open(TESTS_FILE, 'w', encoding='utf-8') as f:
-            test_data = {code: test.to_dict() for code, test in tests.items()}
-            json.dump(test_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"Saved {len(test_data)} tests to {TESTS_FILE}")
+        test_data = {code: test.to_dict() for code, test in tests.items()}
+        datafile.write_records(TESTS_FILE, test_data)
+        logger.info(f"Saved {len(test_data)} tests to {TESTS_FILE}")
+
+        # Save open tests
+        open_test_data = {code: test.to_dict() for code, test in open_tests.items()}
+        datafile.write_records(OPEN_TESTS_FILE, open_test_data)
+        logger.info(f"Saved {len(open_test_data)} open tests to {OPEN_TESTS_FILE}")
         
         # Save students
-        with open(STUDENTS_FILE, 'w', encoding='utf-8') as f:
-            student_data = {str(user_id): student.to_dict() for user_id, student in students.items()}
-            json.dump(student_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"Saved {len(student_data)} students to {STUDENTS_FILE}")
+        students.flush()  # The cache database must match the files once they are written
+        student_data = students.iter_dicts()
+        if USE_SNAPSHOT:
+            student_data = dict(student_data)  # The snapshot is built column by column
+        student_count = datafile.write_records(STUDENTS_FILE, student_data)
+        logger.info(f"Saved {student_count} students to {STUDENTS_FILE}")
+
+        # Save snapshot last so it is never older than the JSON files
+        if USE_SNAPSHOT:
+            save_snapshot(student_data)
+        students.mark_synced(student_sources())
 
         logger.info("All data saved successfully")
     except Exception as e:
@@ -125,28 +1000,48 @@ def save_data():
         raise e  # Re-raise the exception to ensure it's not silently ignored
 
 def load_data():
-    """Load all data from JSON files."""
-    global tests, students
+    """Load all data from the snapshot if enabled and fresh, otherwise from JSON files."""
+    global tests
     
     try:
         # Create data directory if it doesn't exist
         if not os.path.exists('data'):
             os.makedirs('data')
             logger.info("Created data directory")
+
+        # Load open tests (not part of the snapshot)
+        if os.path.exists(OPEN_TESTS_FILE):
+            open_tests_data = datafile.load_records(OPEN_TESTS_FILE)
+            open_tests.clear()
+            open_tests.update({code: OpenTest.from_dict(data) for code, data in open_tests_data.items()})
+            logger.info(f"Loaded {len(open_tests)} open tests from {OPEN_TESTS_FILE}")
+
+        # Students only need loading if the files changed since the cache database was synced
+        load_students = not students.is_synced(student_sources())
+        if not load_students:
+            logger.info(f"Using {len(students)} students from {STUDENT_CACHE_FILE}")
+
+        if USE_SNAPSHOT and snapshot_is_fresh():
+            try:
+                load_snapshot(load_students)
+                if load_students:
+                    students.mark_synced(student_sources())
+                logger.info("All data loaded successfully")
+                return
+            except ValueError as e:
+                logger.warning(f"Falling back to JSON files: {e}")
         
         # Load tests
         if os.path.exists(TESTS_FILE):
-            with open(TESTS_FILE, 'r', encoding='utf-8') as f:
-                tests_data = json.load(f)
-                tests = {code: Test.from_dict(data) for code, data in tests_data.items()}
-                logger.info(f"Loaded {len(tests)} tests from {TESTS_FILE}")
+            tests_data = datafile.load_records(TESTS_FILE)
+            tests = {code: Test.from_dict(data) for code, data in tests_data.items()}
+            logger.info(f"Loaded {len(tests)} tests from {TESTS_FILE}")
         
         # Load students
-        if os.path.exists(STUDENTS_FILE):
-            with open(STUDENTS_FILE, 'r', encoding='utf-8') as f:
-                students_data = json.load(f)
-                students = {int(user_id): Student.from_dict(data) for user_id, data in students_data.items()}
-                logger.info(f"Loaded {len(students)} students from {STUDENTS_FILE}")
+        if load_students:
+            students.load((int(user_id), data) for user_id, data in datafile.iter_records(STUDENTS_FILE))
+            students.mark_synced(student_sources())
+            logger.info(f"Loaded {len(students)} students from {STUDENTS_FILE}")
 
         logger.info("All data loaded successfully")
     except Exception as e:
@@ -168,6 +1063,9 @@ async def setup_commands(application: Application):
         BotCommand("testlarim", "Testlaringiz haqida ma'lumotlar"),
         BotCommand("students", "O'quvchilar ro'yxati"),
         BotCommand("scores", "Barcha natijalar"),
+        BotCommand("cache", "Xotira keshi statistikasi"),
+        BotCommand("flood", "Flood himoyasi statistikasi"),
+        BotCommand("similar", "O'xshash javoblarni topish"),
         BotCommand("info", "Bot haqida ma'lumot"),
     ]
     
@@ -207,8 +1105,9 @@ async def testlarim_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     user_tests = [code for code, test in tests.items() if test.creator_id in ADMIN_IDS]
+    user_open_tests = [code for code, test in open_tests.items() if test.creator_id in ADMIN_IDS]
     
-    if not user_tests:
+    if not user_tests and not user_open_tests:
         await update.message.reply_text("❌ Siz hali test yaratmagansiz!")
         return
 
@@ -223,8 +1122,21 @@ async def testlarim_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             response += f"🔑 To'g'ri javoblar: {test.code.upper()}\n"
             response += f"📅 Sana: {test.date_created.strftime('%Y-%m-%d %H:%M')}\n"
             response += "➖➖➖➖➖➖➖➖➖➖\n"
-    
-    await update.message.reply_text(response)
+    if user_open_tests:
+        response += "\n✍️ Ochiq testlar:\n"
+        for code in user_open_tests:
+            test = open_tests[code]
+            response += f"📌 Test kodi: {code}\n"
+            response += f"📋 Test nomi: {test.name}\n"
+            response += f"✅ Javoblar soni: {len(test.attempts)} ta\n"
+            response += "🔑 To'g'ri javoblar:\n"
+            for i, alternatives in enumerate(test.answers, 1):
+                response += f"{i}) {' | '.join(alternatives)}\n"
+            response += f"📅 Sana: {test.date_created.strftime('%Y-%m-%d %H:%M')}\n"
+            response += "➖➖➖➖➖➖➖➖➖➖\n"
+
+    for i in range(0, len(response), 4096):
+        await update.message.reply_text(response[i:i+4096])
 
 async def edit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /edit command."""
@@ -290,6 +1202,18 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=reply_markup
         )
 
+OPEN_TEST_HELP = (
+    "❗️Ochiq test yaratish\n\n"
+    "✅ochiq: deb yozib, test nomi, : (ikki nuqta) va savollar javoblarini ; (nuqta vergul) bilan ajratib kiritasiz. "
+    "Bir nechta to'g'ri javobni | bilan ajrating.\n\n"
+    "✍️Misol uchun:\n"
+    "ochiq:Tarix:Amir Temur|Temur;1370;Samarqand\n\n"
+    "✏️Javobni o'zgartirish (barcha javoblar qayta tekshiriladi):\n"
+    "javob:O001:2:1370|1369\n\n"
+    "✅O'quvchilar O001*Temur;1370;Samarqand shaklida javob beradi. "
+    "Katta-kichik harflar va kichik imlo xatolari hisobga olinmaydi."
+)
+
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle button callbacks."""
     query = update.callback_query
@@ -306,6 +1230,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 "Yangitest+1a2b3c4d5a6b7c...\n\n"
                 "✅Katta(A) va kichik(a) harflar bir xil hisoblanadi."
             )
+            await query.message.reply_text(OPEN_TEST_HELP)
         elif query.data == "check_test":
             await query.message.reply_text(
                 "❗️Testga javob berish\n\n"
@@ -385,6 +1310,20 @@ async def scores_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Display results grouped by test
     for test_code, results in test_results.items():
         has_results = True
+        if test_code in open_tests:
+            test = open_tests[test_code]
+            response += f"📝 Ochiq test #{test_code} natijalari:\n\n"
+            for idx, result in enumerate(sorted(results, key=lambda x: x["score"], reverse=True), 1):
+                student = result["student"]
+                answers = test.attempts.get(student.user_id, [])
+                response += f"{idx}. {student.full_name}:\n"
+                response += f"📊 Ball: {result['score']:.1f}/100\n"
+                response += f"📅 Sana: {result['date'].strftime('%Y-%m-%d %H:%M')}\n"
+                for i, answer in enumerate(answers, 1):
+                    response += f"{i}) {'✅' if test.is_correct(i - 1, answer) else '❌'} {answer}\n"
+                response += "➖➖➖➖➖➖➖➖➖➖\n\n"
+            continue
+
         test = tests.get(test_code)
         if not test:
             continue
@@ -430,6 +1369,184 @@ async def scores_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         await update.message.reply_text(response)
 
+async def cache_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show student cache statistics (admin only)."""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("❌ Bu buyruq faqat administrator uchun!")
+        return
+
+    stats = students.stats()
+    if store is not None:
+        # Workers drop the cache before every update, so hits and evictions mean nothing here
+        await update.message.reply_text(
+            "🗂 O'quvchilar keshi (ko'p jarayonli rejim):\n\n"
+            f"💾 Saqlangan: {stats['stored']}\n"
+            f"📖 Bazadan o'qildi (shu jarayon): {stats['misses']}\n\n"
+            "ℹ️ Kesh har bir xabardan oldin tozalanadi, hit foizi faqat bitta jarayonli rejimda ko'rsatiladi."
+        )
+        return
+
+    await update.message.reply_text(
+        "🗂 O'quvchilar keshi:\n\n"
+        f"👥 Faol: {stats['active']}/{stats['capacity']}\n"
+        f"💾 Saqlangan: {stats['stored']}\n"
+        f"✅ Topildi (hit): {stats['hits']}\n"
+        f"❌ Topilmadi (miss): {stats['misses']}\n"
+        f"♻️ Chiqarildi: {stats['evictions']}\n"
+        f"📊 Hit foizi: {stats['hit_rate']:.1f}%"
+    )
+
+def _parse_rate_limit(kind):
+    value = os.getenv(f"RATE_LIMIT_{kind.upper()}", RATE_LIMIT_DEFAULTS[kind])
+    burst, per_minute = value.split("/")
+    return int(burst), float(per_minute) / 60
+
+class RateLimiter:
+    """Token bucket per (user_id, kind) of update.
+
+    Each bucket holds up to `burst` tokens and refills at `rate` tokens per
+    second. Buckets that have refilled completely are dropped by prune(),
+    which allow() runs at most once per RATE_LIMIT_PRUNE_INTERVAL.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits  # kind: (burst, rate)
+        self.buckets = {}  # (user_id, kind): [tokens, last update time]
+        self.notified = {}  # user_id: time of the last cooldown notice
+        self.allowed = dict.fromkeys(limits, 0)
+        self.throttled = dict.fromkeys(limits, 0)
+        self.throttled_users = {}  # user_id: time last throttled
+        self.last_prune = None
+
+    def allow(self, user_id, kind, now=None):
+        now = time.monotonic() if now is None else now
+        if self.last_prune is None:
+            self.last_prune = now
+        elif now - self.last_prune >= RATE_LIMIT_PRUNE_INTERVAL:
+            self.prune(now)
+        burst, rate = self.limits[kind]
+        bucket = self.buckets.get((user_id, kind))
+        if bucket is None:
+            bucket = self.buckets[(user_id, kind)] = [burst, now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            self.allowed[kind] += 1
+            return True
+        self.throttled[kind] += 1
+        self.throttled_users[user_id] = now
+        return False
+
+    def should_notify(self, user_id, now=None):
+        """Return True at most once per THROTTLE_REPLY_INTERVAL for a user."""
+        now = time.monotonic() if now is None else now
+        if now - self.notified.get(user_id, -THROTTLE_REPLY_INTERVAL) < THROTTLE_REPLY_INTERVAL:
+            return False
+        self.notified[user_id] = now
+        return True
+
+    def prune(self, now):
+        self.last_prune = now
+        for key, (tokens, last) in list(self.buckets.items()):
+            burst, rate = self.limits[key[1]]
+            if tokens + (now - last) * rate >= burst:
+                del self.buckets[key]
+        for user_id, last in list(self.notified.items()):
+            if now - last >= THROTTLE_REPLY_INTERVAL:
+                del self.notified[user_id]
+        for user_id, last in list(self.throttled_users.items()):
+            if now - last >= THROTTLED_USERS_WINDOW:
+                del self.throttled_users[user_id]
+
+rate_limiter = RateLimiter({kind: _parse_rate_limit(kind) for kind in RATE_LIMIT_DEFAULTS})
+catching_up = False  # Queued updates are replayed without rate limiting
+
+def update_kind(update: Update):
+    """Classify an update for rate limiting, or None if it is not limited."""
+    if update.callback_query is not None:
+        return "callback"
+    message = update.message
+    if message is None or message.text is None:
+        return None
+    if message.text.startswith("/"):
+        return "command"
+    if "*" in message.text:
+        return "answer"
+    return "message"
+
+async def flood_guard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Drop updates from users who exceed their rate limit, before any other handler runs."""
+    user = update.effective_user
+    if catching_up or user is None or user.id in ADMIN_IDS:
+        return
+    kind = update_kind(update)
+    if kind is None or rate_limiter.allow(user.id, kind):
+        return
+
+    notify = THROTTLE_REPLY and rate_limiter.should_notify(user.id)
+    notice = "⏳ Juda ko'p xabar yubordingiz! Biroz kutib, qaytadan urinib ko'ring."
+    if update.callback_query is not None:
+        # Always answer the query, otherwise the button keeps its loading spinner
+        await update.callback_query.answer(notice if notify else None)
+    elif notify:
+        await update.message.reply_text(notice)
+    raise ApplicationHandlerStop
+
+async def flood_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show flood protection statistics (admin only)."""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("❌ Bu buyruq faqat administrator uchun!")
+        return
+
+    response = "🛡 Flood himoyasi:\n\n"
+    for kind, (burst, rate) in rate_limiter.limits.items():
+        response += (
+            f"• {kind}: {rate_limiter.allowed[kind]} o'tkazildi, "
+            f"{rate_limiter.throttled[kind]} to'xtatildi "
+            f"(limit {burst}, {rate * 60:g}/daqiqa)\n"
+        )
+    rate_limiter.prune(time.monotonic())
+    response += f"\n👥 Oxirgi soatda cheklangan foydalanuvchilar: {len(rate_limiter.throttled_users)}"
+    await update.message.reply_text(response)
+
+async def similar_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show groups of students with the same wrong answers (admin only)."""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("❌ Bu buyruq faqat administrator uchun!")
+        return
+
+    if not context.args:
+        await update.message.reply_text("❗️ Test kodini kiriting\n\n✍️ Misol: /similar 001")
+        return
+
+    test_code = context.args[0]
+    if test_code not in tests:
+        await update.message.reply_text("❌ Bunday test mavjud emas")
+        return
+
+    clusters = get_similarity_index(test_code).clusters()
+    if not clusters:
+        await update.message.reply_text(f"✅ Test #{test_code} da shubhali o'xshash javoblar topilmadi")
+        return
+
+    response = f"🔍 Test #{test_code}: bir xil xato javoblar\n\n"
+    for idx, (members, shared) in enumerate(clusters, 1):
+        response += f"{idx}. {len(members)} ta o'quvchi, {len(shared)} ta umumiy xato:\n"
+        for user_id in members:
+            student = students.peek(user_id)  # Don't pull every member into the cache
+            name = student.full_name if student is not None else str(user_id)
+            response += f"👤 {name}\n"
+        wrong = sorted(shared, key=lambda token: int(token[:-1]))
+        if wrong:
+            response += "❌ " + ", ".join(f"{token[:-1]}) {token[-1].upper()}" for token in wrong) + "\n"
+        response += "➖➖➖➖➖➖➖➖➖➖\n\n"
+
+    for i in range(0, len(response), 4096):
+        await update.message.reply_text(response[i:i+4096])
+
 def validate_name(name: str) -> tuple[bool, str]:
     """Validate the name format."""
     # Remove extra spaces
@@ -454,6 +1571,267 @@ def validate_name(name: str) -> tuple[bool, str]:
     
     return True, name
 
+def _minhash_permutations(count, prime):
+    """Fixed (a, b) pairs for the hash functions (a * h + b) % prime."""
+    rng = random.Random(0)
+    return [(rng.randrange(1, prime), rng.randrange(prime)) for _ in range(count)]
+
+class SimilarityIndex:
+    """Finds students who gave the same wrong answers on one test.
+
+    Every answer is reduced to its wrong-answer tokens ("3b" = answered B
+    to question 3, which was wrong). MinHash signatures of these sets are
+    split into LSH bands, so students with heavily overlapping wrong
+    answers land in a shared bucket. Adding an answer costs O(bands) and
+    clusters are read from the buckets, with no pairwise comparison over
+    all attempts.
+
+    Mistakes that a large part of the class makes are a shared
+    misconception, not copying: shared mistakes are weighted by how rare
+    they are, and buckets holding more than COMMON_SHARE of all attempts
+    are skipped. Partitioning a bucket is quadratic in its number of
+    distinct wrong-answer sets, so buckets with more than MAX_DISTINCT of
+    them are skipped as well, which bounds clusters() to
+    O(attempts * BANDS * MAX_DISTINCT).
+    """
+
+    BANDS = 8
+    ROWS = 4  # Bucket collisions start around Jaccard (1/BANDS) ** (1/ROWS) ~ 0.6
+    THRESHOLD = 0.6  # Minimum Jaccard similarity of wrong answers to join a cluster
+    MIN_WRONG = 2  # Answers with fewer wrong tokens are too common to be suspicious
+    COMMON_SHARE = 0.05  # A mistake or bucket covering more of the class than this is common
+    MIN_BUCKET_LIMIT = 10  # Buckets up to this size are always checked, even in small classes
+    MAX_DISTINCT = 10  # Buckets with more distinct wrong-answer sets are skipped; keeps clusters() linear
+    PRIME = (1 << 61) - 1
+    PERMUTATIONS = _minhash_permutations(BANDS * ROWS, PRIME)
+
+    def __init__(self, key):
+        self.key = key
+        self.tokens = {}  # user_id: frozenset of wrong-answer tokens
+        self.buckets = {}  # (band, band signature): [user_id]
+        self.token_hashes = {}  # token: hash under every permutation (few distinct tokens per test)
+        self.token_counts = {}  # token: number of students who made this mistake
+
+    def add(self, user_id, answer):
+        if user_id in self.tokens:
+            return
+        tokens = frozenset(
+            f"{i}{user_ans}"
+            for i, (user_ans, correct_ans) in enumerate(zip(answer, self.key), 1)
+            if user_ans != correct_ans
+        )
+        self.tokens[user_id] = tokens
+        for token in tokens:
+            self.token_counts[token] = self.token_counts.get(token, 0) + 1
+        if len(tokens) < self.MIN_WRONG:
+            return
+
+        signature = [min(column) for column in zip(*(self._hashes(token) for token in tokens))]
+        for band in range(self.BANDS):
+            key = (band, tuple(signature[band * self.ROWS:(band + 1) * self.ROWS]))
+            self.buckets.setdefault(key, []).append(user_id)
+
+    def _hashes(self, token):
+        hashes = self.token_hashes.get(token)
+        if hashes is None:
+            h = zlib.crc32(token.encode("utf-8"))
+            hashes = self.token_hashes[token] = tuple((a * h + b) % self.PRIME for a, b in self.PERMUTATIONS)
+        return hashes
+
+    def update(self, attempts):
+        """Index attempts that were not added yet (e.g. loaded or synced ones)."""
+        if len(attempts) != len(self.tokens):
+            for user_id, answer in attempts.items():
+                self.add(user_id, answer)
+
+    def _similar(self, tokens_a, tokens_b):
+        # Jaccard >= THRESHOLD, using |A | B| = |A| + |B| - |A & B|
+        common = len(tokens_a & tokens_b)
+        return common * (1 + self.THRESHOLD) >= self.THRESHOLD * (len(tokens_a) + len(tokens_b))
+
+    def clusters(self, limit=5):
+        """Return up to `limit` (user_ids, shared wrong tokens), most suspicious first.
+
+        Clusters are not merged transitively: within each LSH bucket, every
+        cluster is a seed student plus the members similar to that seed.
+        A cluster must share at least MIN_WRONG mistakes, and the rarity of
+        the shared mistakes (sum of log(students / students with the
+        mistake)) must match MIN_WRONG mistakes made by COMMON_SHARE of the
+        class. Clusters are ranked by that rarity, then by size.
+        """
+        total = len(self.tokens)
+        max_bucket = max(self.MIN_BUCKET_LIMIT, self.COMMON_SHARE * total)
+        min_weight = self.MIN_WRONG * math.log(1 / self.COMMON_SHARE)
+        candidates = {}
+        for members in self.buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) > max_bucket:
+                continue  # Too much of the class to be a group copying from each other
+            # Students with identical wrong answers are compared once
+            by_tokens = {}
+            for user_id in members:
+                by_tokens.setdefault(self.tokens[user_id], []).append(user_id)
+            if len(by_tokens) > self.MAX_DISTINCT:
+                continue  # Many different answers colliding: a common pattern, not one copied sheet
+            remaining = list(by_tokens)
+            while remaining:
+                seed = remaining[0]
+                group_tokens = {seed}
+                group_tokens.update(tokens for tokens in remaining[1:] if self._similar(seed, tokens))
+                remaining = [tokens for tokens in remaining if tokens not in group_tokens]
+                group = [user_id for tokens in group_tokens for user_id in by_tokens[tokens]]
+                if len(group) < 2:
+                    continue
+                shared = frozenset.intersection(*group_tokens)
+                if len(shared) < self.MIN_WRONG:
+                    continue
+                weight = sum(math.log(total / self.token_counts[token]) for token in shared)
+                if weight >= min_weight:
+                    candidates[frozenset(group)] = (shared, weight)
+
+        ranked = sorted(candidates.items(), key=lambda cluster: (cluster[1][1], len(cluster[0])), reverse=True)
+        result = []
+        for group, (shared, _) in ranked:
+            # The same students show up in several bands; report each group once
+            if any(group <= chosen for chosen, _ in result):
+                continue
+            result.append((group, shared))
+            if len(result) == limit:
+                break
+        return [(sorted(group), shared) for group, shared in result]
+
+similarity_indexes = {}  # test_code: SimilarityIndex
+
+def get_similarity_index(test_code):
+    """Return the up-to-date similarity index for a test, building it on first use."""
+    test = tests[test_code]
+    index = similarity_indexes.get(test_code)
+    if index is None or index.key != test.code:
+        index = similarity_indexes[test_code] = SimilarityIndex(test.code)
+    index.update(test.attempts)
+    return index
+
+def grade_submission(user_id, test_code, answer):
+    """Check a student's answer and record the result.
+
+    Returns (recorded, feedback) where feedback is the reply for the student.
+    The caller is responsible for saving data when recorded is True.
+    """
+    if test_code not in tests:
+        return False, "❌ Bunday test mavjud emas!"
+
+    test = tests[test_code]
+
+    # Check if the test was created by an admin
+    if test.creator_id not in ADMIN_IDS:
+        return False, "❌ Bu test mavjud emas!"
+
+    if user_id in test.attempts:
+        return False, "❌ Siz bu testga allaqachon javob bergansiz!"
+
+    correct_key = test.code
+    if len(answer) != len(correct_key):
+        return False, "❌ Javob uzunligi noto'g'ri!"
+
+    # Calculate score without showing individual answers
+    student = students[user_id]  # Get student info for personalized message
+    correct_count = sum(1 for user_ans, correct_ans in zip(answer, correct_key) if user_ans == correct_ans)
+    total_questions = len(correct_key)
+    percentage = (correct_count / total_questions) * 100
+
+    if test.is_scored:
+        score = (correct_count / total_questions) * test.max_score
+        feedback = f"📝 {student.full_name} ning test natijalari:\n\n"
+        feedback += f"✅ To'g'ri javoblar: {correct_count} ta\n"
+        feedback += f"📊 Ball: {score:.1f}/{test.max_score}\n"
+        feedback += f"💯 Foiz: {percentage:.1f}%"
+    else:
+        score = percentage
+        feedback = f"📝 {student.full_name} ning test natijalari:\n\n"
+        feedback += f"✅ To'g'ri javoblar: {correct_count} ta\n"
+        feedback += f"💯 Foiz: {percentage:.1f}%"
+    result = {"score": score, "date": datetime.now()}
+
+    # Another worker may have recorded an answer since our last sync
+    if store is not None and not store.record_attempt(test_code, user_id, answer, result):
+        return False, "❌ Siz bu testga allaqachon javob bergansiz!"
+
+    # Store test result
+    student.test_results[test_code] = result
+    if store is not None:
+        students.mark_stored(user_id)  # record_attempt() wrote the result
+    test.attempts[user_id] = answer
+    if test_code in similarity_indexes:
+        similarity_indexes[test_code].add(user_id, answer)
+    return True, feedback
+
+def grade_open_submission(user_id, test_code, answer):
+    """Check a student's answers to an open test ("answer1;answer2;...") and record the result.
+
+    Returns (recorded, feedback) like grade_submission().
+    """
+    test = open_tests[test_code]
+
+    if test.creator_id not in ADMIN_IDS:
+        return False, "❌ Bu test mavjud emas!"
+
+    if user_id in test.attempts:
+        return False, "❌ Siz bu testga allaqachon javob bergansiz!"
+
+    answers = [part.strip() for part in answer.split(";")]
+    if len(answers) != len(test.answers):
+        return False, f"❌ Javoblar soni noto'g'ri! Testda {len(test.answers)} ta savol bor."
+
+    student = students[user_id]
+    correct_count = test.count_correct(answers)
+    percentage = (correct_count / len(test.answers)) * 100
+    result = {"score": percentage, "date": datetime.now()}
+
+    if store is not None and not store.record_attempt(test_code, user_id, answers, result):
+        return False, "❌ Siz bu testga allaqachon javob bergansiz!"
+
+    student.test_results[test_code] = result
+    if store is not None:
+        students.mark_stored(user_id)
+    test.attempts[user_id] = answers
+    feedback = f"📝 {student.full_name} ning test natijalari:\n\n"
+    feedback += f"✅ To'g'ri javoblar: {correct_count} ta\n"
+    feedback += f"💯 Foiz: {percentage:.1f}%"
+    return True, feedback
+
+def submit_answer(user_id, test_code, answer):
+    """Grade a "code*answer" submission against a regular or open test."""
+    if test_code in open_tests:
+        return grade_open_submission(user_id, test_code, answer.strip())
+    return grade_submission(user_id, test_code, answer.strip().lower())
+
+def create_test(collection, prefix, build):
+    """Add build(code) to tests or open_tests under a new code and return the code."""
+    if store is not None:
+        code, test = store.create_test(prefix, build)
+    else:
+        code = f"{prefix}{len(collection) + 1:03d}"
+        test = build(code)
+    collection[code] = test
+    return code
+
+def regrade_open_test(test_code):
+    """Re-score every submission to an open test after its accepted answers changed.
+
+    Each distinct (question, answer) pair is checked once, so classes that
+    give the same answers cost far less than one check per student.
+    Students are not loaded into the cache; only changed results are written.
+    Returns the number of results that changed; the caller saves data.
+    """
+    test = open_tests[test_code]
+    test.prepare()
+    scores = {
+        user_id: (test.count_correct(answers) / len(test.answers)) * 100
+        for user_id, answers in test.attempts.items()
+    }
+    return students.set_scores(test_code, scores)
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle incoming messages."""
     message = update.message.text
@@ -553,51 +1931,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if "*" in message:
             try:
                 test_code, answer = message.split("*", 1)
-                test_code = test_code.strip()
-                answer = answer.strip().lower()
-
-                if test_code not in tests:
-                    await update.message.reply_text("❌ Bunday test mavjud emas!")
-                    return
-
-                test = tests[test_code]
-                
-                # Check if the test was created by an admin
-                if test.creator_id not in ADMIN_IDS:
-                    await update.message.reply_text("❌ Bu test mavjud emas!")
-                    return
-
-                if user_id in test.attempts:
-                    await update.message.reply_text("❌ Siz bu testga allaqachon javob bergansiz!")
-                    return
-
-                correct_key = test.code
-                if len(answer) != len(correct_key):
-                    await update.message.reply_text("❌ Javob uzunligi noto'g'ri!")
-                    return
-
-                # Calculate score without showing individual answers
-                student = students[user_id]  # Get student info for personalized message
-                correct_count = sum(1 for user_ans, correct_ans in zip(answer, correct_key) if user_ans == correct_ans)
-                total_questions = len(correct_key)
-                percentage = (correct_count / total_questions) * 100
-
-                # Store test result
-                if test.is_scored:
-                    score = (correct_count / total_questions) * test.max_score
-                    student.test_results[test_code] = {"score": score, "date": datetime.now()}
-                    feedback = f"📝 {student.full_name} ning test natijalari:\n\n"
-                    feedback += f"✅ To'g'ri javoblar: {correct_count} ta\n"
-                    feedback += f"📊 Ball: {score:.1f}/{test.max_score}\n"
-                    feedback += f"💯 Foiz: {percentage:.1f}%"
-                else:
-                    student.test_results[test_code] = {"score": percentage, "date": datetime.now()}
-                    feedback = f"📝 {student.full_name} ning test natijalari:\n\n"
-                    feedback += f"✅ To'g'ri javoblar: {correct_count} ta\n"
-                    feedback += f"💯 Foiz: {percentage:.1f}%"
-
-                test.attempts[user_id] = answer
-                save_data()  # Save after test submission
+                recorded, feedback = submit_answer(user_id, test_code.strip(), answer)
+                if recorded:
+                    save_data()  # Save after test submission
                 await update.message.reply_text(feedback)
 
             except ValueError:
@@ -659,6 +1995,58 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("❌ Noto'g'ri format!")
         return
 
+    # Handle open test creation: ochiq:Name:answer1|alternative;answer2;...
+    if message.startswith("ochiq:"):
+        try:
+            _, test_name, answer_text = message.split(":", 2)
+            answers = [
+                [alternative.strip() for alternative in question.split("|") if alternative.strip()]
+                for question in answer_text.split(";")
+            ]
+            if not test_name.strip() or not answers or not all(answers):
+                raise ValueError
+
+            test_code = create_test(
+                open_tests, "O", lambda code: OpenTest(code, user_id, test_name.strip(), answers)
+            )
+            save_data()  # Save after test creation
+
+            await update.message.reply_text(
+                f"✅ Ochiq test muvaffaqiyatli yaratildi!\n"
+                f"📋 Test nomi: {test_name.strip()}\n"
+                f"📌 Test kodi: {test_code}\n"
+                f"❓ Savollar soni: {len(answers)} ta"
+            )
+        except ValueError:
+            await update.message.reply_text(OPEN_TEST_HELP)
+        return
+
+    # Handle open test answer changes: javob:O001:2:answer|alternative
+    if message.startswith("javob:"):
+        try:
+            _, test_code, question, answer_text = message.split(":", 3)
+            test_code = test_code.strip()
+            question = int(question) - 1
+            alternatives = [alternative.strip() for alternative in answer_text.split("|") if alternative.strip()]
+            if test_code not in open_tests:
+                await update.message.reply_text("❌ Bunday test mavjud emas")
+                return
+            test = open_tests[test_code]
+            if not alternatives or not 0 <= question < len(test.answers):
+                raise ValueError
+
+            test.answers[question] = alternatives
+            changed = regrade_open_test(test_code)
+            save_data()  # One save for the whole regrade
+
+            await update.message.reply_text(
+                f"✅ {question + 1}-savol javoblari o'zgartirildi: {' | '.join(alternatives)}\n"
+                f"🔄 Qayta tekshirildi: {len(test.attempts)} ta javob, {changed} ta natija o'zgardi"
+            )
+        except ValueError:
+            await update.message.reply_text(OPEN_TEST_HELP)
+        return
+
     # Handle regular test creation
     if "+" in message:
         try:
@@ -677,8 +2065,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 return
 
-            test_code = f"{len(tests) + 1:03d}"
-            tests[test_code] = Test(test_key, user_id, test_name)
+            test_code = create_test(tests, "", lambda code: Test(test_key, user_id, test_name))
             save_data()  # Save after test creation
 
             await update.message.reply_text(
@@ -698,27 +2085,245 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 "✅Katta(A) va kichik(a) harflar bir xil hisoblanadi."
             )
 
+def is_submission(update: Update) -> bool:
+    """Check if an update is a student's test answer (code*answers)."""
+    message = update.message
+    return (
+        message is not None
+        and message.text is not None
+        and not message.text.startswith("/")
+        and "*" in message.text
+        and update.effective_user is not None
+        and update.effective_user.id not in ADMIN_IDS
+    )
+
+async def catch_up(application: Application):
+    """Process updates that queued up while the bot was not running.
+
+    Updates are fetched CATCH_UP_BATCH_SIZE at a time. Telegram only
+    forgets updates once a later request confirms them, so each batch is
+    handled, saved and replied to before the next one is requested; after a
+    crash only the batch in progress is delivered again. Within a batch,
+    updates are deduplicated by update_id and non-answer updates go
+    through the normal handlers first, in order. Only the first answer per
+    (user, test) counts, and every user gets one combined reply per batch.
+    """
+    async def replay(update):
+        # Queued updates arrive all at once; don't let flood_guard throttle them
+        global catching_up
+        catching_up = True
+        try:
+            await application.process_update(update)
+        finally:
+            catching_up = False
+
+    seen = set()  # (user_id, test_code)
+    update_count = answer_count = recorded_count = 0
+    notified = set()
+    offset = None
+    while True:
+        updates = await application.bot.get_updates(
+            offset=offset, limit=CATCH_UP_BATCH_SIZE, timeout=0, allowed_updates=Update.ALL_TYPES
+        )
+        if not updates:
+            break
+        if offset is None:
+            logger.info("Catching up on pending updates")
+        pending = {update.update_id: update for update in updates}
+        update_count += len(pending)
+
+        # Registrations, commands etc. first, so answers from newly registered students count
+        submissions = []
+        for update_id in sorted(pending):
+            update = pending[update_id]
+            if is_submission(update):
+                submissions.append(update)
+            else:
+                await replay(update)
+
+        replies = {}  # chat_id: [feedback]
+        batch_recorded = 0
+        for update in submissions:
+            user_id = update.effective_user.id
+            if user_id not in students:
+                # Not registered, let the normal handler ask for a name
+                await replay(update)
+                continue
+
+            test_code, answer = update.message.text.split("*", 1)
+            test_code = test_code.strip()
+            if (user_id, test_code) in seen:
+                continue
+
+            recorded, feedback = submit_answer(user_id, test_code, answer)
+            test = tests.get(test_code) or open_tests.get(test_code)
+            if test is not None and user_id in test.attempts:
+                # Answered now or before; skip later resubmissions without another reply.
+                # Rejected answers (e.g. wrong length) don't count, so a corrected one is still graded.
+                seen.add((user_id, test_code))
+            batch_recorded += recorded
+            replies.setdefault(update.effective_chat.id, []).append(feedback)
+
+        if batch_recorded:
+            save_data()  # One save per batch
+        answer_count += len(submissions)
+        recorded_count += batch_recorded
+
+        for chat_id, feedback in replies.items():
+            response = "\n\n➖➖➖➖➖➖➖➖➖➖\n\n".join(feedback)
+            try:
+                for i in range(0, len(response), 4096):
+                    await application.bot.send_message(chat_id, response[i:i+4096])
+            except Exception as e:
+                logger.error(f"Failed to send catch-up reply to {chat_id}: {e}")
+        notified.update(replies)
+
+        # Confirms this batch to Telegram
+        offset = updates[-1].update_id + 1
+
+    if update_count:
+        logger.info(
+            f"Caught up: {update_count} updates, {answer_count} answers, {recorded_count} recorded, "
+            f"{len(notified)} users notified"
+        )
+
+async def refresh_store_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Sync with the shared store before the other handlers see the update."""
+    refresh_from_store()
+
+def build_application(post_init=None, request=None):
+    """Create the Application and register all handlers."""
+    builder = Application.builder().token(token)
+    if post_init:
+        builder.post_init(post_init)
+    if request:
+        builder.request(request)
+    application = builder.build()
+
+    # Runs before every other handler group
+    application.add_handler(TypeHandler(Update, flood_guard), group=-2)
+
+    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("testlarim", testlarim_command))
+    application.add_handler(CommandHandler("students", students_command))
+    application.add_handler(CommandHandler("scores", scores_command))
+    application.add_handler(CommandHandler("cache", cache_command))
+    application.add_handler(CommandHandler("flood", flood_command))
+    application.add_handler(CommandHandler("similar", similar_command))
+    application.add_handler(CommandHandler("edit", edit_command))
+    application.add_handler(CommandHandler("info", info_command))
+    application.add_handler(CallbackQueryHandler(button_callback))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    return application
+
+def connect_store():
+    """Switch this process to the shared store (worker processes only)."""
+    global store, students
+
+    store = SharedStore(STORE_FILE)
+    students = SharedStudentCache(STUDENT_CACHE_SIZE, store)
+    refresh_from_store()
+
+def build_worker_application(request=None):
+    """Create the Application for a worker process, syncing with the store before each update."""
+    application = build_application(request=request)
+    application.add_handler(TypeHandler(Update, refresh_store_handler), group=-1)
+    return application
+
+def run_worker(index):
+    """Run one webhook replica listening on WEBHOOK_PORT + index."""
+    connect_store()
+
+    application = build_worker_application()
+    # Every worker registers the same public URL; retries cover Telegram rate limits
+    application.run_webhook(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT + index,
+        webhook_url=WEBHOOK_URL,
+        secret_token=os.getenv("WEBHOOK_SECRET"),
+        allowed_updates=Update.ALL_TYPES,
+        bootstrap_retries=5,
+    )
+
+def run_workers():
+    """Run WORKERS webhook replicas that share the SQLite store."""
+    if not WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL must be set when WORKERS > 1")
+
+    shared_store = SharedStore(STORE_FILE)
+    if shared_store.had_clean_shutdown():
+        # JSON files hold the latest data; after a crash the store is newer
+        load_data()
+        shared_store.import_data(tests, open_tests, students.iter_dicts())
+    else:
+        logger.warning(f"Previous run did not shut down cleanly, keeping data from {STORE_FILE}")
+    shared_store.close()
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(index,), name=f"worker-{index}")
+        for index in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {WORKERS} workers on ports {WEBHOOK_PORT}-{WEBHOOK_PORT + WORKERS - 1}")
+
+    def stop_workers(signum, frame):
+        # Each worker shuts down cleanly on SIGTERM; the export below runs once they exit
+        for process in processes:
+            process.terminate()
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+    finally:
+        export_store()
+
+def export_store():
+    """Write the shared store back to the JSON files and mark a clean shutdown."""
+    shared_store = SharedStore(STORE_FILE)
+    exported_tests, exported_open_tests, student_records = shared_store.export_data()
+    tests.clear()
+    tests.update(exported_tests)
+    open_tests.clear()
+    open_tests.update(exported_open_tests)
+    students.load(student_records)
+    save_data()
+    shared_store.mark_clean_shutdown()
+    shared_store.close()
+
+def unclean_store_shutdown():
+    """Check if the last multi-worker run ended without writing its data back."""
+    if not os.path.exists(STORE_FILE):
+        return False
+    shared_store = SharedStore(STORE_FILE)
+    clean = shared_store.had_clean_shutdown()
+    shared_store.close()
+    return not clean
+
 def main():
     """Start the bot."""
+    if WORKERS > 1:
+        run_workers()
+        return
+
     try:
-        # Load saved data
-        load_data()
+        if unclean_store_shutdown():
+            # Workers were killed before writing their data back
+            logger.warning(f"Previous run did not shut down cleanly, recovering data from {STORE_FILE}")
+            export_store()
+        else:
+            # Load saved data
+            load_data()
         
         # Create the Application and pass it your bot's token
-        application = Application.builder().token(token).build()
-
-        # Add handlers
-        application.add_handler(CommandHandler("start", start_command))
-        application.add_handler(CommandHandler("testlarim", testlarim_command))
-        application.add_handler(CommandHandler("students", students_command))
-        application.add_handler(CommandHandler("scores", scores_command))
-        application.add_handler(CommandHandler("edit", edit_command))
-        application.add_handler(CommandHandler("info", info_command))
-        application.add_handler(CallbackQueryHandler(button_callback))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+        application = build_application(catch_up if CATCH_UP else None)
 
         # Start the bot
-        application.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+        application.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=not CATCH_UP)
     except Exception as e:
         logger.error(f"Error running bot: {e}")
         raise e
@@ -0,0 +1,122 @@
+"""Reading and writing the bot's JSON data files.
+
+Files are written as schema version 2: compact JSON with one record per
+line, so they stay valid JSON but can also be read one record at a time:
+
+    {"version":2,"data":{
+    "001":{"code":"abcd",...},
+    "002":{"code":"bcda",...}
+    }}
+
+Version 1 files (a bare, pretty-printed mapping) are still read.
+
+The JSON codec is orjson when installed, otherwise the standard library.
+Set JSON_CODEC=json to force the standard library.
+"""
+import json
+import os
+
+SCHEMA_VERSION = 2
+HEADER = b'{"version":%d,"data":{\n' % SCHEMA_VERSION
+FOOTER = b"}}\n"
+
+
+class StdlibCodec:
+    name = "json"
+
+    @staticmethod
+    def dumps(value):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def __init__(self, orjson):
+        self.orjson = orjson
+
+    def dumps(self, value):
+        return self.orjson.dumps(value, option=self.orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+
+def get_codec(name=None):
+    """Return the codec called `name`, or the fastest one available."""
+    name = name or os.getenv("JSON_CODEC", "orjson")
+    if name == "orjson":
+        try:
+            import orjson
+        except ImportError:
+            return StdlibCodec()
+        return OrjsonCodec(orjson)
+    return StdlibCodec()
+
+
+codec = get_codec()
+
+
+def write_records(path, records):
+    """Write a {key: record} mapping or (key, record) pairs atomically in the version 2 layout.
+
+    Returns the number of records written.
+    """
+    items = records.items() if hasattr(records, "items") else records
+    count = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER)
+        for key, record in items:
+            if count:
+                f.write(b",\n")
+            f.write(codec.dumps(str(key)) + b":" + codec.dumps(record))
+            count += 1
+        if count:
+            f.write(b"\n")
+        f.write(FOOTER)
+    os.replace(tmp_path, path)
+    return count
+
+
+def load_records(path):
+    """Load the whole {key: record} mapping from a version 1 or 2 file."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        data = codec.loads(f.read())
+    return _unwrap(data, path)
+
+
+def _unwrap(data, path):
+    if isinstance(data, dict) and "version" in data and "data" in data:
+        if data["version"] > SCHEMA_VERSION:
+            raise ValueError(f"{path} has schema version {data['version']}, newest supported is {SCHEMA_VERSION}")
+        return data["data"]
+    return data  # Version 1
+
+
+def iter_records(path):
+    """Yield (key, record) pairs without loading the whole file.
+
+    Only version 2 files can be streamed; older or hand-formatted files are
+    loaded in full first.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        if f.readline() != HEADER:
+            f.seek(0)
+            yield from _unwrap(codec.loads(f.read()), path).items()
+            return
+        for line in f:
+            if line == FOOTER:
+                break
+            line = line.rstrip(b"\n")
+            if line.endswith(b","):
+                line = line[:-1]
+            yield next(iter(codec.loads(b"{" + line + b"}").items()))
@@ -0,0 +1,158 @@
+"""Load test for multi-worker mode: answer throughput vs worker count.
+
+Every worker process builds the same Application as a webhook worker and
+feeds it "code*answer" messages through process_update, so each update
+runs the real handlers: flood guard, store sync, grading, saving and the
+reply. Telegram itself is replaced by FakeRequest, which answers API calls
+instantly, so the numbers are bound by the bot and the SQLite store. Each
+(student, test) answer is sent twice, to different workers, and the run
+fails if any attempt is recorded twice.
+
+Worker processes only add throughput when there are CPU cores for them.
+
+Usage: python loadtest.py [max_workers] [students]
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "loadtest")
+os.environ.setdefault("RATE_LIMIT_ANSWER", "1000000/1000000")  # Each student answers every test twice
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+import bot
+
+TEST_COUNT = 10
+ANSWER_KEY = "abcdabcdabcdabcdabcd"
+
+
+class FakeRequest(BaseRequest):
+    """Answer Telegram API calls locally and count the result replies sent."""
+
+    def __init__(self):
+        self.results = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if url.endswith("/getMe"):
+            result = {"id": 1, "is_bot": True, "first_name": "Loadtest", "username": "loadtest_bot"}
+        else:
+            params = request_data.parameters if request_data else {}
+            text = params.get("text", "")
+            if text.startswith("📝"):
+                self.results += 1
+            result = {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": params.get("chat_id", 0), "type": "private"},
+                "text": text,
+            }
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def setup_store(student_count):
+    """Create a fresh shared store with synthetic tests and students."""
+    bot.tests.clear()
+    for i in range(1, TEST_COUNT + 1):
+        bot.tests[f"{i:03d}"] = bot.Test(ANSWER_KEY, bot.ADMIN_IDS[0], f"Test {i}")
+    records = (
+        (user_id, bot.Student(user_id, f"Student{user_id} Familiya").to_dict())
+        for user_id in range(1, student_count + 1)
+    )
+    store = bot.SharedStore(bot.STORE_FILE)
+    store.import_data(bot.tests, {}, records)
+    store.close()
+
+
+def make_update(update_id, user_id, text):
+    chat = {"id": user_id, "type": "private"}
+    sender = {"id": user_id, "is_bot": False, "first_name": f"Student{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {"message_id": update_id, "date": 0, "chat": chat, "from": sender, "text": text},
+    }
+
+
+async def process(application, updates):
+    await application.initialize()
+    for data in updates:
+        await application.process_update(Update.de_json(data, application.bot))
+    await application.shutdown()
+
+
+def worker(updates, recorded):
+    bot.logger.disabled = True
+    bot.connect_store()
+    request = FakeRequest()
+    asyncio.run(process(bot.build_worker_application(request), updates))
+    with recorded.get_lock():
+        recorded.value += request.results
+
+
+def run(worker_count, student_count):
+    setup_store(student_count)
+    rng = random.Random(worker_count)
+    submissions = []
+    for user_id in range(1, student_count + 1):
+        for i in range(1, TEST_COUNT + 1):
+            answer = "".join(rng.choice("abcd") for _ in ANSWER_KEY)
+            submissions += [(user_id, f"{i:03d}*{answer}")] * 2
+    rng.shuffle(submissions)
+    updates = [make_update(update_id, user_id, text) for update_id, (user_id, text) in enumerate(submissions, 1)]
+
+    recorded = multiprocessing.Value("i", 0)
+    processes = [
+        multiprocessing.Process(target=worker, args=(updates[i::worker_count], recorded))
+        for i in range(worker_count)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    store = bot.SharedStore(bot.STORE_FILE)
+    attempts = store.conn.execute("SELECT COUNT(*) FROM attempts").fetchone()[0]
+    results = store.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    store.close()
+    expected = student_count * TEST_COUNT
+    if not attempts == results == recorded.value == expected:
+        raise SystemExit(
+            f"Inconsistent store: {attempts} attempts, {results} results, "
+            f"{recorded.value} recorded, expected {expected}"
+        )
+    return len(submissions) / elapsed
+
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    student_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    bot.logger.disabled = True
+
+    print(f"CPUs: {os.cpu_count()}, students: {student_count}, tests: {TEST_COUNT}")
+    with tempfile.TemporaryDirectory() as data_dir:
+        bot.STORE_FILE = os.path.join(data_dir, "bot.db")
+        baseline = None
+        worker_count = 1
+        while worker_count <= max_workers:
+            throughput = run(worker_count, student_count)
+            baseline = baseline or throughput
+            print(f"{worker_count} workers: {throughput:8.1f} updates/s  ({throughput / baseline:.2f}x)")
+            worker_count *= 2
+
+
+if __name__ == "__main__":
+    main()
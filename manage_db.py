@@ -2,22 +2,22 @@ import json
 import os
 from datetime import datetime
 
+import datafile
+
 # Data storage files
 TESTS_FILE = "data/tests.json"
 STUDENTS_FILE = "data/students.json"
 OPEN_TESTS_FILE = "data/open_tests.json"
 
+PAGE_SIZE = 20
+
 def load_json(file_path):
     """Load data from a JSON file."""
-    if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+    return datafile.load_records(file_path)
 
 def save_json(file_path, data):
     """Save data to a JSON file."""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    datafile.write_records(file_path, data)
 
 def backup_data():
     """Create a backup of all database files."""
@@ -49,8 +49,25 @@ def restore_data(backup_dir):
     
     print("✅ Data restored successfully!")
 
-def view_data(file_type):
-    """View data from a specific file."""
+def matches(file_type, key, record, user_id=None, test_code=None):
+    """Check if a record belongs to the given user and/or test."""
+    if file_type == "students":
+        if user_id and key != user_id:
+            return False
+        if test_code and test_code not in record.get("test_results", {}):
+            return False
+    else:
+        if test_code and key != test_code:
+            return False
+        if user_id and user_id not in record.get("attempts", {}):
+            return False
+    return True
+
+def view_data(file_type, user_id=None, test_code=None, page_size=PAGE_SIZE):
+    """View data from a specific file, one page at a time.
+
+    Records are streamed from the file, so only the current page is kept in memory.
+    """
     file_map = {
         "students": STUDENTS_FILE,
         "tests": TESTS_FILE,
@@ -66,9 +83,27 @@ def view_data(file_type):
         print(f"❌ File {file_path} not found!")
         return
     
-    data = load_json(file_path)
     print(f"\n📊 {file_type.upper()} DATA:")
-    print(json.dumps(data, ensure_ascii=False, indent=2))
+    shown = 0
+    page = 1
+    for key, record in datafile.iter_records(file_path):
+        if not matches(file_type, key, record, user_id, test_code):
+            continue
+        print(f"\n{key}: {json.dumps(record, ensure_ascii=False, indent=2)}")
+        shown += 1
+        if shown % page_size == 0:
+            answer = input(f"\n📄 Page {page} - press Enter for more, q to stop: ")
+            if answer.strip().lower() == "q":
+                return
+            page += 1
+
+    print(f"\n✅ {shown} record(s) shown" if shown else "\n❌ No matching records")
+
+def ask_filters():
+    """Ask for optional user_id and test code filters."""
+    user_id = input("Filter by user_id (Enter to skip): ").strip() or None
+    test_code = input("Filter by test code (Enter to skip): ").strip() or None
+    return user_id, test_code
 
 def main():
     while True:
@@ -88,11 +123,11 @@ def main():
             backup_dir = input("Enter backup directory name (e.g., backup_20240320_123456): ")
             restore_data(f"data/{backup_dir}")
         elif choice == "3":
-            view_data("students")
+            view_data("students", *ask_filters())
         elif choice == "4":
-            view_data("tests")
+            view_data("tests", *ask_filters())
         elif choice == "5":
-            view_data("open_tests")
+            view_data("open_tests", *ask_filters())
         elif choice == "6":
             print("👋 Goodbye!")
             break
@@ -0,0 +1,3 @@
+import os
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test")
@@ -0,0 +1,104 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import bot
+
+
+class FakeTelegram:
+    """Pending update queue that, like Telegram, forgets updates only once a later offset confirms them."""
+
+    def __init__(self, updates):
+        self.queue = list(updates)
+        self.sent = []  # (chat_id, text)
+        self.processed = []  # update_ids passed to the normal handlers
+        self.events = []
+
+    async def get_updates(self, offset=None, limit=100, **kwargs):
+        if offset is not None:
+            self.queue = [update for update in self.queue if update.update_id >= offset]
+        self.events.append(("fetch", offset))
+        return self.queue[:limit]
+
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+
+    async def process_update(self, update):
+        self.processed.append(update.update_id)
+
+    @property
+    def application(self):
+        return SimpleNamespace(bot=self, process_update=self.process_update)
+
+
+def message(update_id, user_id, text):
+    return SimpleNamespace(
+        update_id=update_id,
+        message=SimpleNamespace(text=text),
+        effective_user=SimpleNamespace(id=user_id),
+        effective_chat=SimpleNamespace(id=user_id),
+    )
+
+
+@pytest.fixture
+def telegram(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, "students", bot.StudentCache(100, str(tmp_path / "students_cache.db")))
+    monkeypatch.setattr(bot, "tests", {"001": bot.Test("abcd", bot.ADMIN_IDS[0], "Test")})
+    monkeypatch.setattr(bot, "similarity_indexes", {})
+    for user_id in range(1, 4):
+        bot.students[user_id] = bot.Student(user_id, f"Student{user_id} Familiya")
+    fake = FakeTelegram([])
+    monkeypatch.setattr(bot, "save_data", lambda: fake.events.append(("save", len(bot.tests["001"].attempts))))
+    return fake
+
+
+def test_first_answer_counts_and_corrections_are_graded(telegram):
+    telegram.queue = [
+        message(1, 1, "001*abcd"),
+        message(2, 1, "001*dddd"),  # Resubmission: ignored without another reply
+        message(2, 1, "001*dddd"),  # Same update delivered twice
+        message(3, 2, "001*abc"),  # Wrong length: rejected
+        message(4, 2, "001*abca"),  # Corrected: graded
+        message(5, 3, "salom"),
+    ]
+    asyncio.run(bot.catch_up(telegram.application))
+
+    assert bot.tests["001"].attempts == {1: "abcd", 2: "abca"}
+    assert bot.students[1].test_results["001"]["score"] == 100.0
+    assert telegram.processed == [5]
+    replies = dict(telegram.sent)
+    assert replies[1].count("natijalari") == 1
+    assert "uzunligi" in replies[2] and "natijalari" in replies[2]
+
+
+def test_each_batch_is_saved_before_it_is_confirmed(telegram, monkeypatch):
+    monkeypatch.setattr(bot, "CATCH_UP_BATCH_SIZE", 2)
+    telegram.queue = [message(i, i, "001*abcd") for i in (1, 2, 3)]
+    asyncio.run(bot.catch_up(telegram.application))
+
+    assert telegram.events == [
+        ("fetch", None), ("save", 2),
+        ("fetch", 3), ("save", 3),
+        ("fetch", 4),
+    ]
+    assert telegram.queue == []
+
+
+def test_crash_keeps_unfinished_batch_queued(telegram, monkeypatch):
+    monkeypatch.setattr(bot, "CATCH_UP_BATCH_SIZE", 2)
+    telegram.queue = [message(i, i, "001*abcd") for i in (1, 2, 3)]
+    grade = bot.submit_answer
+
+    def crash_on_third(user_id, test_code, answer):
+        if user_id == 3:
+            raise RuntimeError("killed")
+        return grade(user_id, test_code, answer)
+
+    monkeypatch.setattr(bot, "submit_answer", crash_on_third)
+    with pytest.raises(RuntimeError):
+        asyncio.run(bot.catch_up(telegram.application))
+
+    # The first batch was saved and confirmed; the third answer is still queued
+    assert ("save", 2) in telegram.events
+    assert [update.update_id for update in telegram.queue] == [3]
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+import datafile
+
+RECORDS = {
+    "001": {"code": "abcd", "creator_id": 1, "name": "Tarix ✅", "attempts": {"5": "abca"}},
+    "O002": {"code": None, "answers": [["Amir Temur", "Temur"], ["1370"]], "attempts": {}},
+    "42": {"full_name": "O'quvchi \"Familiya\"", "note": "},\n{\"x\":1}", "test_results": {}},
+}
+
+
+@pytest.fixture(params=["json", "orjson"], autouse=True)
+def codec(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    codec = datafile.get_codec(request.param)
+    assert codec.name == request.param
+    monkeypatch.setattr(datafile, "codec", codec)
+    return codec
+
+
+def test_version_1_file_is_rewritten_as_version_2(tmp_path):
+    path = str(tmp_path / "tests.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(RECORDS, f, ensure_ascii=False, indent=4)
+    assert datafile.load_records(path) == RECORDS
+    assert dict(datafile.iter_records(path)) == RECORDS
+
+    assert datafile.write_records(path, datafile.load_records(path)) == len(RECORDS)
+    with open(path, "rb") as f:
+        assert f.readline() == datafile.HEADER
+    assert datafile.load_records(path) == RECORDS
+
+
+@pytest.mark.parametrize("records", [RECORDS, {}, {"1": {}}])
+def test_iter_records_matches_load_records(tmp_path, records):
+    path = str(tmp_path / "students.json")
+    datafile.write_records(path, iter(records.items()))
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"version": 2, "data": records}
+    assert list(datafile.iter_records(path)) == list(datafile.load_records(path).items())
+    assert datafile.load_records(path) == records
+
+
+def test_missing_file_is_empty(tmp_path):
+    path = str(tmp_path / "missing.json")
+    assert datafile.load_records(path) == {}
+    assert list(datafile.iter_records(path)) == []
+
+
+def test_newer_schema_version_is_rejected(tmp_path):
+    path = str(tmp_path / "tests.json")
+    with open(path, "w") as f:
+        json.dump({"version": datafile.SCHEMA_VERSION + 1, "data": {}}, f)
+    with pytest.raises(ValueError):
+        datafile.load_records(path)
@@ -0,0 +1,46 @@
+import asyncio
+from types import SimpleNamespace
+
+import bot
+
+
+class Query:
+    def __init__(self):
+        self.answers = []
+
+    async def answer(self, text=None):
+        self.answers.append(text)
+
+
+def callback(user_id, query):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), callback_query=query, message=None)
+
+
+def test_throttled_callbacks_are_always_answered(monkeypatch):
+    monkeypatch.setattr(bot, "rate_limiter", bot.RateLimiter({"callback": (1, 0.001)}))
+    query = Query()
+    for _ in range(3):
+        try:
+            asyncio.run(bot.flood_guard(callback(1, query), None))
+        except bot.ApplicationHandlerStop:
+            pass
+
+    # The first press passes; both throttled presses clear the spinner, only the first shows the notice
+    assert len(query.answers) == 2
+    assert query.answers[0] is not None and query.answers[1] is None
+
+
+def test_prune_runs_once_per_interval(monkeypatch):
+    limiter = bot.RateLimiter({"answer": (3, 1.0)})
+    sweeps = []
+    prune = limiter.prune
+    monkeypatch.setattr(limiter, "prune", lambda now: sweeps.append(now) or prune(now))
+
+    for user_id in range(20000):
+        limiter.allow(user_id, "answer", now=user_id * 0.001)
+    assert sweeps == []
+    assert len(limiter.buckets) == 20000
+
+    limiter.allow(0, "answer", now=bot.RATE_LIMIT_PRUNE_INTERVAL)
+    assert sweeps == [bot.RATE_LIMIT_PRUNE_INTERVAL]
+    assert len(limiter.buckets) == 1  # Only the bucket just used is not full
@@ -0,0 +1,46 @@
+import pytest
+
+import bot
+
+
+def make_test(*answers):
+    return bot.OpenTest("O001", bot.ADMIN_IDS[0], "Test", [[answer] for answer in answers])
+
+
+def test_typos_in_words_are_accepted():
+    test = make_test("fotosintez", "Toshkent")
+    assert test.is_correct(0, "Fotosintiz")
+    assert test.is_correct(1, "toshkent.")
+    assert not test.is_correct(1, "Samarqand")
+
+
+def test_numbers_must_match_exactly():
+    test = make_test("1370-yil", "12 kg", "1945")
+    assert test.is_correct(0, "1370-yl")
+    assert not test.is_correct(0, "1399-yil")
+    assert not test.is_correct(0, "1370-yil 5")
+    assert test.is_correct(1, "12 kg")
+    assert not test.is_correct(1, "13 kg")
+    assert not test.is_correct(2, "1946")
+
+
+def test_regrade_does_not_load_students(tmp_path, monkeypatch):
+    cache = bot.StudentCache(2, str(tmp_path / "students_cache.db"))
+    monkeypatch.setattr(bot, "students", cache)
+    test = make_test("Temur", "1370")
+    monkeypatch.setattr(bot, "open_tests", {"O001": test})
+    for user_id in range(1, 7):
+        cache[user_id] = bot.Student(user_id, f"Student{user_id} Familiya")
+        test.attempts[user_id] = ["Temur", "1369" if user_id % 2 else "1370"]
+        cache[user_id].test_results["O001"] = {"score": 50.0 if user_id % 2 else 100.0, "date": bot.datetime.now()}
+    test.attempts[7] = ["Temur", "1369"]  # Not registered
+    cache.flush()
+    active = list(cache.active)
+    monkeypatch.setattr(cache.store, "put_students", lambda records: pytest.fail("students were written back"))
+
+    test.answers[1] = ["1370", "1369"]
+    assert bot.regrade_open_test("O001") == 3
+    assert list(cache.active) == active
+    assert cache.misses == 0
+    assert [cache.peek(user_id).test_results["O001"]["score"] for user_id in range(1, 7)] == [100.0] * 6
+    assert 7 not in cache
@@ -0,0 +1,81 @@
+import random
+import time
+
+import bot
+
+
+def random_answers(rng, key, count, correct_rate=0.6):
+    return [
+        "".join(c if rng.random() < correct_rate else rng.choice("abcd") for c in key)
+        for _ in range(count)
+    ]
+
+
+def test_planted_ring_ranks_first():
+    rng = random.Random(7)
+    key = "".join(rng.choice("abcd") for _ in range(30))
+    index = bot.SimilarityIndex(key)
+    for user_id, answer in enumerate(random_answers(rng, key, 5000)):
+        index.add(user_id, answer)
+
+    # Three students copying the same 20 wrong answers
+    copied = list(key)
+    for i in range(20):
+        copied[i] = next(c for c in "abcd" if c != key[i])
+    ring = [100001, 100002, 100003]
+    for user_id in ring:
+        index.add(user_id, "".join(copied))
+
+    clusters = index.clusters()
+    members, shared = clusters[0]
+    assert members == ring
+    assert len(shared) == 20
+
+
+def test_clusters_share_mistakes():
+    rng = random.Random(3)
+    key = "".join(rng.choice("abcd") for _ in range(30))
+    index = bot.SimilarityIndex(key)
+    for user_id, answer in enumerate(random_answers(rng, key, 5000, correct_rate=0.3)):
+        index.add(user_id, answer)
+
+    for members, shared in index.clusters(limit=50):
+        assert len(shared) >= bot.SimilarityIndex.MIN_WRONG
+        assert all(shared <= index.tokens[user_id] for user_id in members)
+
+
+def test_correct_answers_are_not_clustered():
+    index = bot.SimilarityIndex("abcdabcd")
+    for user_id in range(10):
+        index.add(user_id, "abcdabcd")
+    assert index.clusters() == []
+
+
+def common_mistake_class(key, count):
+    """Students who all got the same two questions wrong the same way."""
+    wrong = "".join(next(c for c in "abcd" if c != key[i]) if i < 2 else key[i] for i in range(len(key)))
+    index = bot.SimilarityIndex(key)
+    for user_id in range(count):
+        index.add(user_id, wrong)
+    return index, wrong
+
+
+def test_common_mistake_is_not_a_ring():
+    key = "abcd" * 5
+    index, _ = common_mistake_class(key, 8000)
+    start = time.perf_counter()
+    assert index.clusters() == []
+    assert time.perf_counter() - start < 1.0
+
+
+def test_ring_found_among_common_mistake():
+    key = "abcd" * 5
+    index, wrong = common_mistake_class(key, 8000)
+    copied = wrong[:10] + "".join(next(c for c in "abcd" if c != k) for k in key[10:16]) + wrong[16:]
+    ring = [100001, 100002, 100003]
+    for user_id in ring:
+        index.add(user_id, copied)
+
+    members, shared = index.clusters()[0]
+    assert members == ring
+    assert len(shared) == 8
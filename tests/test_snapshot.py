@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+import bot
+
+
+@pytest.fixture
+def data(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, "TESTS_FILE", str(tmp_path / "tests.json"))
+    monkeypatch.setattr(bot, "STUDENTS_FILE", str(tmp_path / "students.json"))
+    monkeypatch.setattr(bot, "OPEN_TESTS_FILE", str(tmp_path / "open_tests.json"))
+    monkeypatch.setattr(bot, "SNAPSHOT_FILE", str(tmp_path / "snapshot.bin"))
+    monkeypatch.setattr(bot, "USE_SNAPSHOT", True)
+    monkeypatch.setattr(bot, "open_tests", {})
+    monkeypatch.setattr(bot, "students", bot.StudentCache(2, str(tmp_path / "students_cache.db")))
+
+    tests = {}
+    for i in range(1, 4):
+        test = bot.Test("abcd" * i, bot.ADMIN_IDS[0], f"Test {i} ✅")
+        test.date_created = datetime(2024, 5, i, 10, 30)
+        test.is_scored = i == 2
+        test.max_score = 2.5 if i == 2 else 100
+        tests[f"{i:03d}"] = test
+    monkeypatch.setattr(bot, "tests", tests)
+    for user_id in range(1, 6):
+        student = bot.Student(user_id, f"O'quvchi{user_id} Familiya")
+        student.registration_date = datetime(2024, 4, user_id, 8, 0, 0, 123456)
+        for i in range(1, user_id % 3 + 2):
+            code = f"{i:03d}"
+            student.test_results[code] = {"score": user_id * 10.5, "date": datetime(2024, 5, i, 11, user_id)}
+            tests[code].attempts[user_id] = "abcd" * i
+        bot.students[user_id] = student
+    bot.save_data()
+    return tmp_path
+
+
+def snapshot_state():
+    tests = {
+        code: (test.to_dict(), test.is_scored, test.max_score)
+        for code, test in bot.tests.items()
+    }
+    return tests, sorted(bot.students.iter_dicts())
+
+
+def test_round_trip(data, tmp_path, monkeypatch):
+    expected = snapshot_state()
+    monkeypatch.setattr(bot, "tests", {})
+    monkeypatch.setattr(bot, "students", bot.StudentCache(2, str(tmp_path / "fresh.db")))
+
+    bot.load_snapshot()
+    assert snapshot_state() == expected
+
+
+def test_truncated_snapshot_falls_back_to_json(data, tmp_path, monkeypatch):
+    expected = snapshot_state()
+    with open(bot.SNAPSHOT_FILE, "rb") as f:
+        snapshot = f.read()
+
+    for cut in range(0, len(snapshot), 7):
+        with open(bot.SNAPSHOT_FILE, "wb") as f:
+            f.write(snapshot[:cut])
+        with pytest.raises(ValueError):
+            bot.load_snapshot()
+
+        # The truncated snapshot is newer than the JSON files, so load_data() tries it first
+        monkeypatch.setattr(bot, "tests", {})
+        monkeypatch.setattr(bot, "students", bot.StudentCache(2, str(tmp_path / f"cut{cut}.db")))
+        bot.load_data()
+        assert snapshot_state() == expected
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+import bot
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return bot.StudentCache(2, str(tmp_path / "students_cache.db"))
+
+
+@pytest.fixture
+def data_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, "TESTS_FILE", str(tmp_path / "tests.json"))
+    monkeypatch.setattr(bot, "STUDENTS_FILE", str(tmp_path / "students.json"))
+    monkeypatch.setattr(bot, "OPEN_TESTS_FILE", str(tmp_path / "open_tests.json"))
+    monkeypatch.setattr(bot, "SNAPSHOT_FILE", str(tmp_path / "snapshot.bin"))
+    monkeypatch.setattr(bot, "USE_SNAPSHOT", False)
+    monkeypatch.setattr(bot, "tests", {})
+    return tmp_path
+
+
+def test_evicted_student_is_written_back_and_faulted_in(cache):
+    for user_id in (1, 2):
+        cache[user_id] = bot.Student(user_id, f"Student{user_id} Familiya")
+    cache[1].full_name = "Changed Name"
+    cache[2]  # Student 1 is now least recently used
+    cache[3] = bot.Student(3, "Student3 Familiya")
+
+    assert list(cache.active) == [2, 3]
+    assert cache.store.get_student(1)["full_name"] == "Changed Name"
+    assert len(cache) == 3 and 1 in cache
+
+    assert cache[1].full_name == "Changed Name"
+    assert cache.misses == 1
+    assert list(cache.active) == [3, 1]
+
+
+def test_unchanged_students_are_not_rewritten(cache, monkeypatch):
+    for user_id in (1, 2, 3):
+        cache[user_id] = bot.Student(user_id, f"Student{user_id} Familiya")
+    writes = []
+    monkeypatch.setattr(cache.store, "put_students", writes.append)
+
+    for user_id in (1, 2, 3, 1):
+        cache[user_id]
+    cache.flush()
+    assert writes == [[]]  # flush() found nothing to write
+
+    cache[1].test_results["001"] = {"score": 50.0, "date": bot.datetime.now()}
+    cache.flush()
+    assert [record["user_id"] for record in writes[-1]] == [1]
+
+
+def test_peek_does_not_touch_the_cache(cache):
+    for user_id in (1, 2, 3):
+        cache[user_id] = bot.Student(user_id, f"Student{user_id} Familiya")
+    active = list(cache.active)
+
+    assert cache.peek(1).full_name == "Student1 Familiya"
+    assert cache.peek(4) is None
+    assert list(cache.active) == active
+    assert cache.misses == 0
+
+
+def test_cache_database_is_kept_across_restarts(data_files, monkeypatch):
+    path = str(data_files / "students_cache.db")
+    monkeypatch.setattr(bot, "students", bot.StudentCache(2, path))
+    for user_id in range(1, 6):
+        bot.students[user_id] = bot.Student(user_id, f"Student{user_id} Familiya")
+    bot.save_data()
+    bot.students.store.close()
+
+    # Files unchanged since the last save: students are not reloaded
+    restarted = bot.StudentCache(2, path)
+    monkeypatch.setattr(bot, "students", restarted)
+    monkeypatch.setattr(restarted, "load", lambda records: pytest.fail("students were reloaded"))
+    bot.load_data()
+    assert len(bot.students) == 5
+    restarted.store.close()
+
+    # An edited students.json wins over the cache database
+    records = dict(bot.datafile.load_records(bot.STUDENTS_FILE))
+    records["3"]["full_name"] = "Edited Name"
+    bot.datafile.write_records(bot.STUDENTS_FILE, records)
+    stat = os.stat(bot.STUDENTS_FILE)
+    os.utime(bot.STUDENTS_FILE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    monkeypatch.setattr(bot, "students", bot.StudentCache(2, path))
+    bot.load_data()
+    assert bot.students[3].full_name == "Edited Name"
+    assert len(bot.students) == 5